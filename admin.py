@@ -1,9 +1,12 @@
 from functools import wraps
 from datetime import datetime
 
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, current_app
 from flask_login import login_required, current_user
+from sqlalchemy.orm import aliased, contains_eager, selectinload
 from werkzeug.security import generate_password_hash
+from .prerequisites import PrerequisiteError, add_prerequisite, remove_prerequisite
+from .profiling import profiled_endpoints, top_functions
 from .models import (
     db,
     User,
@@ -13,6 +16,7 @@ from .models import (
     Analyst,
     University,
     Course,
+    CoursePrerequisite,
     Topic,
     Enrollment,
     DeregistrationRequest,
@@ -70,6 +74,7 @@ def dashboard():
             lambda: DeregistrationRequest.query.filter_by(status='pending').count(),
             default=0,
         ),
+        'profiled_endpoints': len(profiled_endpoints(current_app)),
     }
 
     return render_template(
@@ -202,7 +207,7 @@ def instructors():
 @login_required
 @admin_required
 def courses():
-    items = _safe_query(lambda: Course.query.all(), default=[])
+    items = _safe_query(lambda: Course.query.options(selectinload(Course.instructors)).all(), default=[])
     universities = _safe_query(lambda: University.query.all(), default=[])
     instructors_list = _safe_query(lambda: Instructor.query.all(), default=[])
     if request.method == 'POST' and request.form.get('action') == 'delete':
@@ -256,13 +261,67 @@ def courses():
                 db.session.rollback()
                 flash(f'Error: {e}')
             return redirect(url_for('admin.courses'))
+    if request.method == 'POST' and request.form.get('action') == 'add_prerequisite':
+        cid = request.form.get('course_id')
+        pid = request.form.get('prerequisite_id')
+        if cid and pid:
+            try:
+                if Course.query.get(int(cid)) and Course.query.get(int(pid)):
+                    add_prerequisite(int(cid), int(pid))
+                    db.session.commit()
+                    flash('Prerequisite added.')
+                else:
+                    flash('Course not found.')
+            except PrerequisiteError as e:
+                db.session.rollback()
+                flash(str(e))
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Error: {e}')
+            return redirect(url_for('admin.courses'))
+    if request.method == 'POST' and request.form.get('action') == 'remove_prerequisite':
+        cid = request.form.get('course_id')
+        pid = request.form.get('prerequisite_id')
+        if cid and pid:
+            try:
+                if remove_prerequisite(int(cid), int(pid)):
+                    db.session.commit()
+                    flash('Prerequisite removed.')
+                else:
+                    flash('Prerequisite not found.')
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Error: {e}')
+            return redirect(url_for('admin.courses'))
+    if request.method == 'POST' and request.form.get('action') == 'set_capacity':
+        cid = request.form.get('course_id')
+        capacity = request.form.get('capacity', '').strip()
+        if cid:
+            try:
+                course = Course.query.get(int(cid))
+                if course and (not capacity or int(capacity) >= 0):
+                    # Raising or removing the limit promotes waitlisted students (see enrollments.py).
+                    course.capacity = int(capacity) if capacity else None
+                    db.session.commit()
+                    flash('Course capacity updated.')
+                elif course:
+                    flash('Capacity must be zero or more.')
+                else:
+                    flash('Course not found.')
+            except Exception as e:
+                db.session.rollback()
+                flash(f'Error: {e}')
+            return redirect(url_for('admin.courses'))
     if request.method == 'POST' and request.form.get('action') == 'add':
         course_name = request.form.get('course_name')
         duration_weeks = request.form.get('duration_weeks')
+        capacity = request.form.get('capacity', '').strip()
         c_type = request.form.get('c_type')
         uni_id = request.form.get('uni_id')
         if not course_name or not uni_id:
             flash('Course name and university are required.')
+        elif capacity and not capacity.isdigit():
+            flash('Capacity must be zero or more.')
         elif Course.query.filter_by(course_name=course_name).first():
             flash('Course name already exists.')
         else:
@@ -270,6 +329,7 @@ def courses():
                 c = Course(
                     course_name=course_name,
                     duration_weeks=int(duration_weeks) if duration_weeks else None,
+                    capacity=int(capacity) if capacity else None,
                     c_type=c_type if c_type in ('degree', 'diploma', 'certificate') else None,
                     uni_id=int(uni_id)
                 )
@@ -280,7 +340,17 @@ def courses():
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error: {e}')
-    return render_template('admin/courses.html', items=items, universities=universities, instructors_list=instructors_list)
+    prerequisites = {}
+    for course_id, prereq in _safe_query(
+        lambda: db.session.query(CoursePrerequisite.course_id, Course)
+        .join(Course, Course.course_id == CoursePrerequisite.prerequisite_id)
+        .order_by(Course.course_name)
+        .all(),
+        default=[],
+    ):
+        prerequisites.setdefault(course_id, []).append(prereq)
+    return render_template('admin/courses.html', items=items, universities=universities,
+                           instructors_list=instructors_list, prerequisites=prerequisites)
 
 
 @admin.route('/universities', methods=['GET', 'POST'])
@@ -397,11 +467,19 @@ def enrollments():
 @admin_required
 def deregistration_requests():
     """View and act on deregistration requests from instructors."""
+    # Student and Instructor both join users; alias them so the eager
+    # loads read the right columns.
+    student, instructor = aliased(Student, flat=True), aliased(Instructor, flat=True)
     requests_q = _safe_query(
         lambda: DeregistrationRequest.query
-        .join(Student, DeregistrationRequest.student_id == Student.user_id)
+        .join(student, DeregistrationRequest.student_id == student.user_id)
         .join(Course, DeregistrationRequest.course_id == Course.course_id)
-        .join(Instructor, DeregistrationRequest.instructor_id == Instructor.user_id)
+        .join(instructor, DeregistrationRequest.instructor_id == instructor.user_id)
+        .options(
+            contains_eager(DeregistrationRequest.student.of_type(student)),
+            contains_eager(DeregistrationRequest.course),
+            contains_eager(DeregistrationRequest.instructor.of_type(instructor)),
+        )
         .order_by(DeregistrationRequest.created_at.desc())
         .all(),
         default=[],
@@ -457,3 +535,22 @@ def deregistration_requests():
         return redirect(url_for('admin.deregistration_requests'))
 
     return render_template('admin/deregistration_requests.html', items=requests_q)
+
+
+@admin.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    """Top functions by cumulative time from sampled request profiles."""
+    endpoints = profiled_endpoints(current_app)
+    selected = request.args.get('name')
+    if selected not in dict(endpoints):
+        selected = endpoints[0][0] if endpoints else None
+
+    functions = top_functions(current_app, selected) if selected else []
+    return render_template(
+        'admin/profiles.html',
+        endpoints=endpoints,
+        selected=selected,
+        functions=functions,
+    )
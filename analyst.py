@@ -1,9 +1,15 @@
-from flask import Blueprint, render_template, abort
+import os
+from datetime import date, datetime
+from functools import wraps
+
+from flask import Blueprint, render_template, abort, jsonify, request, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import func, case
 
+from .analytics_snapshot import GROUP_KEYS, load_snapshot, snapshot_dir
+from .http_cache import CATALOG, conditional, data_version_stamp, enrollments_stamp, users_stamp
+from .reporting import reporting_session
 from .models import (
-    db,
     Course,
     University,
     Enrollment,
@@ -17,10 +23,28 @@ from .models import (
 # -------------------------------------------------
 analyst = Blueprint("analyst", __name__, url_prefix="/analyst")
 
+UNIVERSITIES_PER_PAGE = 20
+
+
+def _analytics_stamps(**view_args):
+    """Everything the analyst pages read changes one of these."""
+    return [
+        data_version_stamp(CATALOG, reporting_session),
+        enrollments_stamp(reporting_session),
+        users_stamp(reporting_session),
+    ]
+
+
+def analyst_required(f):
+    """403 for non-analysts; goes before @conditional so they never get a 304."""
 
-def analyst_only():
-    if not current_user.is_authenticated or current_user.role != "analyst":
-        abort(403)
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.role != "analyst":
+            abort(403)
+        return f(*args, **kwargs)
+
+    return decorated
 
 
 # -------------------------------------------------
@@ -28,14 +52,14 @@ def analyst_only():
 # -------------------------------------------------
 @analyst.route("/dashboard")
 @login_required
+@analyst_required
+@conditional(_analytics_stamps)
 def dashboard():
-    analyst_only()
-
     stats = {
-        "students": Student.query.count(),
-        "instructors": Instructor.query.count(),
-        "courses": Course.query.count(),
-        "enrollments": Enrollment.query.count(),
+        "students": reporting_session.query(Student).count(),
+        "instructors": reporting_session.query(Instructor).count(),
+        "courses": reporting_session.query(Course).count(),
+        "enrollments": reporting_session.query(Enrollment).count(),
     }
 
     return render_template(
@@ -49,11 +73,11 @@ def dashboard():
 # -------------------------------------------------
 @analyst.route("/courses")
 @login_required
+@analyst_required
+@conditional(_analytics_stamps)
 def course_analysis():
-    analyst_only()
-
     courses = (
-        db.session.query(
+        reporting_session.query(
             Course.course_id,
             Course.course_name,
             University.uni_name,
@@ -78,12 +102,12 @@ def course_analysis():
 # -------------------------------------------------
 @analyst.route("/courses/<int:course_id>")
 @login_required
+@analyst_required
+@conditional(_analytics_stamps)
 def course_detail(course_id):
-    analyst_only()
-
     # ---- Course summary ----
     course = (
-        db.session.query(
+        reporting_session.query(
             Course.course_name,
             University.uni_name,
             func.count(Enrollment.student_id).label("enrollments"),
@@ -98,58 +122,53 @@ def course_detail(course_id):
         .first()
     )
 
-    # ---- Marks distribution ----
-    marks_dist = (
-        db.session.query(
-            Enrollment.marks,
-            func.count(Enrollment.student_id)
-        )
-        .filter(Enrollment.course_id == course_id)
-        .filter(Enrollment.marks.isnot(None))
-        .group_by(Enrollment.marks)
-        .order_by(Enrollment.marks)
-        .all()
-    )
-
-    marks = [float(m[0]) for m in marks_dist]
-    counts = [m[1] for m in marks_dist]
-
     return render_template(
         "analyst/course_detail.html",
         course=course,
-        marks=marks,
-        counts=counts
+        course_id=course_id
     )
 
 
 # -------------------------------------------------
 # Instructor performance
 # -------------------------------------------------
-@analyst.route("/instructors")
-@login_required
-def instructor_performance():
-    analyst_only()
+def instructor_stats(session):
+    """(user_id, first_name, last_name, courses, students, avg_marks) per instructor.
 
-    instructors = (
-        db.session.query(
+    Checked against a brute-force count by `flask check-reports`.
+    """
+    # Aggregate enrollments per course first so co-taught courses are not
+    # re-scanned per instructor, then roll the per-course rows up.
+    course_stats = (
+        session.query(
+            Enrollment.course_id.label("course_id"),
+            func.count(Enrollment.student_id).label("students"),
+            func.sum(Enrollment.marks).label("marks_sum"),
+            func.count(Enrollment.marks).label("marks_count"),
+        )
+        .group_by(Enrollment.course_id)
+        .subquery()
+    )
+
+    marks_count = func.sum(course_stats.c.marks_count)
+    return (
+        session.query(
             Instructor.user_id,
             Instructor.first_name,
             Instructor.last_name,
-            func.count(func.distinct(Course.course_id)).label("courses"),
-            func.count(Enrollment.student_id).label("students"),
-            func.round(func.avg(Enrollment.marks), 2).label("avg_marks"),
+            func.count(course_instructors.c.course_id).label("courses"),
+            func.coalesce(func.sum(course_stats.c.students), 0).label("students"),
+            func.round(
+                func.sum(course_stats.c.marks_sum) / func.nullif(marks_count, 0), 2
+            ).label("avg_marks"),
         )
-        .join(
+        .outerjoin(
             course_instructors,
             course_instructors.c.instructor_id == Instructor.user_id
         )
-        .join(
-            Course,
-            Course.course_id == course_instructors.c.course_id
-        )
         .outerjoin(
-            Enrollment,
-            Enrollment.course_id == Course.course_id
+            course_stats,
+            course_stats.c.course_id == course_instructors.c.course_id
         )
         .group_by(
             Instructor.user_id,
@@ -160,18 +179,28 @@ def instructor_performance():
         .all()
     )
 
+
+@analyst.route("/instructors")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def instructor_performance():
+    instructors = instructor_stats(reporting_session)
+
     return render_template(
         "analyst/instructor_performance.html",
         instructors=instructors
     )
+
+
 @analyst.route("/students")
 @login_required
+@analyst_required
+@conditional(_analytics_stamps)
 def student_performance():
-    analyst_only()
-
     # ---- Average marks per student (ALL subjects) ----
     students = (
-        db.session.query(
+        reporting_session.query(
             Student.user_id,
             Student.first_name,
             Student.last_name,
@@ -185,7 +214,7 @@ def student_performance():
 
     # ---- Per-course marks for each student ----
     student_courses = (
-        db.session.query(
+        reporting_session.query(
             Student.user_id,
             Course.course_name,
             Enrollment.marks
@@ -201,14 +230,18 @@ def student_performance():
         students=students,
         student_courses=student_courses
     )
+
+
 @analyst.route("/universities")
 @login_required
+@analyst_required
+@conditional(_analytics_stamps)
 def university_performance():
-    analyst_only()
+    page = request.args.get("page", 1, type=int)
 
-    # ---- University summary ----
-    universities = (
-        db.session.query(
+    # ---- University summary (current page only) ----
+    pagination = (
+        reporting_session.query(
             University.uni_id,
             University.uni_name,
             func.count(func.distinct(Course.course_id)).label("total_courses"),
@@ -219,13 +252,14 @@ def university_performance():
         .outerjoin(Enrollment, Enrollment.course_id == Course.course_id)
         .group_by(University.uni_id, University.uni_name)
         .order_by(University.uni_name)
-        .all()
+        .paginate(page=page, per_page=UNIVERSITIES_PER_PAGE, error_out=False)
     )
+    uni_ids = [u.uni_id for u in pagination.items]
 
-    # ---- Course-level details ----
+    # ---- Course-level details for those universities ----
     courses = (
-        db.session.query(
-            University.uni_id,
+        reporting_session.query(
+            Course.uni_id,
             Course.course_id,
             Course.course_name,
             Course.duration_weeks,
@@ -233,10 +267,10 @@ def university_performance():
             func.round(func.avg(Enrollment.marks), 2).label("avg_marks"),
             func.max(Enrollment.due_by).label("due_by")
         )
-        .join(Course, Course.uni_id == University.uni_id)
         .outerjoin(Enrollment, Enrollment.course_id == Course.course_id)
+        .filter(Course.uni_id.in_(uni_ids))
         .group_by(
-            University.uni_id,
+            Course.uni_id,
             Course.course_id,
             Course.course_name,
             Course.duration_weeks
@@ -245,21 +279,275 @@ def university_performance():
         .all()
     )
 
-    # ---- Instructors per course ----
+    # ---- Instructors for those courses ----
     instructors = (
-        db.session.query(
-            Course.course_id,
+        reporting_session.query(
+            course_instructors.c.course_id,
             Instructor.first_name,
             Instructor.last_name
         )
-        .join(course_instructors, course_instructors.c.instructor_id == Instructor.user_id)
+        .join(Instructor, course_instructors.c.instructor_id == Instructor.user_id)
         .join(Course, Course.course_id == course_instructors.c.course_id)
+        .filter(Course.uni_id.in_(uni_ids))
+        .order_by(Instructor.first_name, Instructor.last_name)
         .all()
     )
 
+    # ---- Group in one pass: university -> courses -> instructor names ----
+    names_by_course = {}
+    for ins in instructors:
+        names_by_course.setdefault(ins.course_id, []).append(
+            f"{ins.first_name} {ins.last_name or ''}".strip()
+        )
+
+    courses_by_uni = {uid: [] for uid in uni_ids}
+    for c in courses:
+        courses_by_uni[c.uni_id].append({
+            "course": c,
+            "instructors": names_by_course.get(c.course_id, []),
+        })
+
+    universities = [
+        {"summary": u, "courses": courses_by_uni[u.uni_id]}
+        for u in pagination.items
+    ]
+
     return render_template(
         "analyst/university_performance.html",
         universities=universities,
-        courses=courses,
-        instructors=instructors
+        pagination=pagination,
+        has_courses=bool(courses)
     )
+
+
+# -------------------------------------------------
+# Chart data (JSON, fetched by the pages after load)
+# -------------------------------------------------
+def _chart_json(payload):
+    """JSON response; every view using it is @conditional, which adds the ETag."""
+    return jsonify(payload)
+
+
+@analyst.route("/api/charts/course-enrollments")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def chart_course_enrollments():
+    # Only the first 12 courses are plotted, so only fetch those.
+    rows = (
+        reporting_session.query(
+            Course.course_name,
+            func.count(Enrollment.student_id).label("enrollments"),
+        )
+        .outerjoin(Enrollment, Enrollment.course_id == Course.course_id)
+        .group_by(Course.course_id, Course.course_name)
+        .order_by(Course.course_name)
+        .limit(12)
+        .all()
+    )
+
+    return _chart_json({
+        "labels": [r.course_name for r in rows],
+        "values": [r.enrollments for r in rows],
+    })
+
+
+@analyst.route("/api/charts/courses/<int:course_id>/marks")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def chart_course_marks(course_id):
+    marks_dist = (
+        reporting_session.query(
+            Enrollment.marks,
+            func.count(Enrollment.student_id)
+        )
+        .filter(Enrollment.course_id == course_id)
+        .filter(Enrollment.marks.isnot(None))
+        .group_by(Enrollment.marks)
+        .order_by(Enrollment.marks)
+        .all()
+    )
+
+    return _chart_json({
+        "labels": [float(m[0]) for m in marks_dist],
+        "values": [m[1] for m in marks_dist],
+    })
+
+
+@analyst.route("/api/charts/student-bands")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def chart_student_bands():
+    averages = (
+        reporting_session.query(func.avg(Enrollment.marks).label("avg_marks"))
+        .filter(Enrollment.marks.isnot(None))
+        .group_by(Enrollment.student_id)
+        .subquery()
+    )
+    band = case(
+        (averages.c.avg_marks < 40, "0–39"),
+        (averages.c.avg_marks < 60, "40–59"),
+        (averages.c.avg_marks < 80, "60–79"),
+        else_="80–100",
+    ).label("band")
+    counts = dict(
+        reporting_session.query(band, func.count())
+        .select_from(averages)
+        .group_by(band)
+        .all()
+    )
+
+    labels = ["0–39", "40–59", "60–79", "80–100"]
+    return _chart_json({
+        "labels": labels,
+        "values": [counts.get(b, 0) for b in labels],
+    })
+
+
+@analyst.route("/api/charts/university-students")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def chart_university_students():
+    rows = (
+        reporting_session.query(
+            University.uni_name,
+            func.count(func.distinct(Enrollment.student_id)).label("total_students"),
+        )
+        .outerjoin(Course, Course.uni_id == University.uni_id)
+        .outerjoin(Enrollment, Enrollment.course_id == Course.course_id)
+        .group_by(University.uni_id, University.uni_name)
+        .order_by(University.uni_name)
+        .all()
+    )
+
+    return _chart_json({
+        "labels": [r.uni_name for r in rows],
+        "values": [r.total_students for r in rows],
+    })
+
+
+@analyst.route("/api/charts/instructor-courses")
+@login_required
+@analyst_required
+@conditional(_analytics_stamps)
+def chart_instructor_courses():
+    rows = (
+        reporting_session.query(
+            course_instructors.c.instructor_id,
+            Course.course_name,
+            func.round(func.avg(Enrollment.marks), 2).label("avg_marks"),
+        )
+        .join(Course, Course.course_id == course_instructors.c.course_id)
+        .outerjoin(Enrollment, Enrollment.course_id == Course.course_id)
+        .group_by(
+            course_instructors.c.instructor_id,
+            Course.course_id,
+            Course.course_name
+        )
+        .order_by(Course.course_name)
+        .all()
+    )
+
+    by_instructor = {}
+    for r in rows:
+        by_instructor.setdefault(str(r.instructor_id), []).append({
+            "course_name": r.course_name,
+            "avg_marks": float(r.avg_marks) if r.avg_marks is not None else None,
+        })
+
+    return _chart_json(by_instructor)
+
+
+# -------------------------------------------------
+# Snapshot queries (served from the NumPy snapshot, not the database)
+# -------------------------------------------------
+_snapshot_cache = {}
+
+
+def _snapshot_stamp(**view_args):
+    """http_cache stamp: the snapshot's meta.json is rewritten on every export."""
+    try:
+        mtime = os.path.getmtime(os.path.join(snapshot_dir(current_app), "meta.json"))
+    except OSError:
+        return [(None, None)]
+    return [(mtime, datetime.utcfromtimestamp(mtime))]
+
+
+def _snapshot():
+    """Load the current snapshot, reusing the mapping until it is re-exported."""
+    directory = snapshot_dir(current_app)
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, "meta.json"))
+    except OSError:
+        abort(404, description="No analytics snapshot exported yet.")
+
+    cached = _snapshot_cache.get(directory)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_snapshot(directory))
+        _snapshot_cache[directory] = cached
+    return cached[1]
+
+
+def _filtered_snapshot():
+    """Apply ?course_id=..&uni_id=..&enrolled_from=YYYY-MM-DD style filters."""
+    snap = _snapshot()
+
+    equals = {}
+    for key in GROUP_KEYS:
+        values = request.args.getlist(key, type=int)
+        if values:
+            equals[key] = values
+    if equals:
+        snap = snap.where(**equals)
+
+    try:
+        low = request.args.get("enrolled_from")
+        high = request.args.get("enrolled_to")
+        if low or high:
+            snap = snap.between(
+                "enrolled_day",
+                date.fromisoformat(low) if low else None,
+                date.fromisoformat(high) if high else None,
+            )
+    except ValueError:
+        abort(400, description="Dates must be YYYY-MM-DD.")
+    return snap
+
+
+@analyst.route("/api/snapshot/group-by/<key>")
+@login_required
+@analyst_required
+@conditional(_snapshot_stamp)
+def snapshot_group_by(key):
+    if key not in GROUP_KEYS:
+        abort(404)
+    snap = _filtered_snapshot()
+
+    return _chart_json({
+        "snapshot_created_at": snap.meta["created_at"],
+        "rows": len(snap),
+        "groups": snap.group_by(key),
+    })
+
+
+@analyst.route("/api/snapshot/percentiles")
+@login_required
+@analyst_required
+@conditional(_snapshot_stamp)
+def snapshot_percentiles():
+    by = request.args.get("by")
+    if by is not None and by not in GROUP_KEYS[:-1]:
+        abort(400, description="Percentiles can be grouped by student_id, course_id or uni_id.")
+    qs = request.args.getlist("q", type=float) or [25, 50, 75, 90]
+    if any(q < 0 or q > 100 for q in qs):
+        abort(400, description="Percentiles must be between 0 and 100.")
+    snap = _filtered_snapshot()
+
+    return _chart_json({
+        "snapshot_created_at": snap.meta["created_at"],
+        "rows": len(snap),
+        "percentiles": snap.percentiles(qs, by=by),
+    })
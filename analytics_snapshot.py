@@ -0,0 +1,262 @@
+"""
+Columnar analytics snapshot of enrollments.
+
+`export_snapshot` dumps every enrollment, keyed by student / course /
+university, into one .npy file per column (int32 ids, float32 marks, dates
+as int32 days since 1970-01-01). Instructor keys live in a separate pair of
+arrays because a course can have several instructors.
+
+`load_snapshot` memory-maps those files and returns a `Snapshot`, which
+supports simple filtering, group-by and percentile queries without touching
+the database.
+"""
+
+import json
+import os
+import shutil
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import select
+
+from .models import Course, Enrollment, course_instructors
+from .reporting import reporting_session
+
+
+EPOCH = date(1970, 1, 1)
+NO_DATE = np.iinfo(np.int32).min
+
+FACT_COLUMNS = ("student_id", "course_id", "uni_id", "marks", "enrolled_day", "due_day")
+PAIR_COLUMNS = ("ci_course_id", "ci_instructor_id")
+GROUP_KEYS = ("student_id", "course_id", "uni_id", "instructor_id")
+
+
+def _day(d):
+    return (d - EPOCH).days if d is not None else NO_DATE
+
+
+def snapshot_dir(app):
+    return app.config.get("ANALYTICS_SNAPSHOT_DIR") or os.path.join(
+        app.instance_path, "analytics_snapshot"
+    )
+
+
+# -------------------------------------------------
+# Export
+# -------------------------------------------------
+def export_snapshot(directory, batch_size=50000):
+    """Write a fresh snapshot to `directory`, replacing any previous one.
+
+    Rows are streamed from the database in batches and accumulated in
+    compact arrays, so memory stays proportional to the output size.
+    Returns the number of enrollment rows written.
+    """
+    cols = {
+        "student_id": array("i"),
+        "course_id": array("i"),
+        "uni_id": array("i"),
+        "marks": array("f"),
+        "enrolled_day": array("i"),
+        "due_day": array("i"),
+    }
+
+    stmt = (
+        select(
+            Enrollment.student_id,
+            Enrollment.course_id,
+            Course.uni_id,
+            Enrollment.marks,
+            Enrollment.enrollment_date,
+            Enrollment.due_by,
+        )
+        .join(Course, Course.course_id == Enrollment.course_id)
+        .execution_options(yield_per=batch_size)
+    )
+    for sid, cid, uid, marks, enrolled, due in reporting_session.execute(stmt):
+        cols["student_id"].append(sid)
+        cols["course_id"].append(cid)
+        cols["uni_id"].append(uid)
+        cols["marks"].append(float(marks) if marks is not None else float("nan"))
+        cols["enrolled_day"].append(_day(enrolled))
+        cols["due_day"].append(_day(due))
+
+    pairs = reporting_session.execute(
+        select(course_instructors.c.course_id, course_instructors.c.instructor_id)
+    ).all()
+
+    arrays = {
+        name: np.frombuffer(buf, dtype=np.float32 if name == "marks" else np.int32)
+        for name, buf in cols.items()
+    }
+    arrays["ci_course_id"] = np.array([p[0] for p in pairs], dtype=np.int32)
+    arrays["ci_instructor_id"] = np.array([p[1] for p in pairs], dtype=np.int32)
+
+    # Write next to the target and swap it in, so readers never see a
+    # half-written snapshot.
+    directory = os.path.abspath(directory)
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": datetime.utcnow().isoformat(),
+            "rows": len(cols["student_id"]),
+            "course_instructor_pairs": len(pairs),
+        }, f)
+
+    old_dir = directory + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return len(cols["student_id"])
+
+
+# -------------------------------------------------
+# Load + query
+# -------------------------------------------------
+def load_snapshot(directory):
+    """Memory-map a snapshot written by `export_snapshot`."""
+    with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = {
+        name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in FACT_COLUMNS + PAIR_COLUMNS
+    }
+    return Snapshot(columns, meta)
+
+
+class Snapshot:
+    """A (possibly filtered) view over the snapshot columns.
+
+    Filtering returns a new view with a narrower row mask; the underlying
+    memory-mapped arrays are shared.
+    """
+
+    def __init__(self, columns, meta, mask=None):
+        self.columns = columns
+        self.meta = meta
+        self.mask = mask
+
+    def __len__(self):
+        if self.mask is None:
+            return len(self.columns["student_id"])
+        return int(self.mask.sum())
+
+    def column(self, name):
+        col = self.columns[name]
+        return col if self.mask is None else col[self.mask]
+
+    def _narrow(self, cond):
+        mask = cond if self.mask is None else (self.mask & cond)
+        return Snapshot(self.columns, self.meta, mask)
+
+    def courses_for_instructors(self, instructor_ids):
+        ci_course = self.columns["ci_course_id"]
+        ci_instr = self.columns["ci_instructor_id"]
+        return np.unique(ci_course[np.isin(ci_instr, instructor_ids)])
+
+    def where(self, **equals):
+        """Keep rows whose key equals a value (or is in a list of values).
+
+        `instructor_id` is resolved to the courses that instructor teaches.
+        """
+        view = self
+        for name, value in equals.items():
+            values = np.atleast_1d(np.asarray(value, dtype=np.int32))
+            if name == "instructor_id":
+                name, values = "course_id", self.courses_for_instructors(values)
+            if name not in FACT_COLUMNS:
+                raise ValueError(f"Unknown filter column: {name}")
+            view = view._narrow(np.isin(self.columns[name], values))
+        return view
+
+    def between(self, name, low=None, high=None):
+        """Keep rows with `low <= column <= high`; dates may be passed as `date`."""
+        col = self.columns[name]
+        cond = np.ones(len(col), dtype=bool)
+        if name.endswith("_day"):
+            cond &= col != NO_DATE
+            low = _day(low) if isinstance(low, date) else low
+            high = _day(high) if isinstance(high, date) else high
+        if low is not None:
+            cond &= col >= low
+        if high is not None:
+            cond &= col <= high
+        return self._narrow(cond)
+
+    def group_by(self, key):
+        """Enrollment count, graded count and mean marks per key value.
+
+        Grouping by `instructor_id` rolls up per-course totals over the
+        course/instructor pairs, so each enrollment counts once per
+        instructor of its course.
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Unknown group-by key: {key}")
+
+        by = "course_id" if key == "instructor_id" else key
+        keys = self.column(by)
+        marks = self.column("marks")
+        graded = ~np.isnan(marks)
+
+        ids, inverse = np.unique(keys, return_inverse=True)
+        if len(ids) == 0:
+            return []
+        counts = np.bincount(inverse, minlength=len(ids))
+        graded_counts = np.bincount(inverse, weights=graded, minlength=len(ids))
+        sums = np.bincount(inverse[graded], weights=marks[graded], minlength=len(ids))
+
+        if key == "instructor_id":
+            ci_course = self.columns["ci_course_id"]
+            ci_instr = self.columns["ci_instructor_id"]
+            pos = np.searchsorted(ids, ci_course)
+            hit = (pos < len(ids)) & (ids[np.minimum(pos, len(ids) - 1)] == ci_course)
+            instr_ids, instr_inverse = np.unique(ci_instr[hit], return_inverse=True)
+            pos = pos[hit]
+            ids = instr_ids
+            counts = np.bincount(instr_inverse, weights=counts[pos], minlength=len(ids))
+            graded_counts = np.bincount(instr_inverse, weights=graded_counts[pos], minlength=len(ids))
+            sums = np.bincount(instr_inverse, weights=sums[pos], minlength=len(ids))
+
+        result = []
+        for i, key_id in enumerate(ids):
+            n_graded = int(graded_counts[i])
+            result.append({
+                key: int(key_id),
+                "enrollments": int(counts[i]),
+                "graded": n_graded,
+                "avg_marks": round(float(sums[i]) / n_graded, 2) if n_graded else None,
+            })
+        return result
+
+    def percentiles(self, qs=(25, 50, 75, 90), by=None):
+        """Marks percentiles over graded rows, overall or per `by` key."""
+        marks = self.column("marks")
+        graded = ~np.isnan(marks)
+        marks = marks[graded]
+
+        def _pct(values):
+            if len(values) == 0:
+                return {f"{q:g}": None for q in qs}
+            return {f"{q:g}": round(float(v), 2) for q, v in zip(qs, np.percentile(values, qs))}
+
+        if by is None:
+            return _pct(marks)
+        if by not in FACT_COLUMNS:
+            raise ValueError(f"Unknown percentile key: {by}")
+
+        keys = self.column(by)[graded]
+        order = np.argsort(keys, kind="stable")
+        keys, marks = keys[order], marks[order]
+        ids, starts = np.unique(keys, return_index=True)
+        bounds = list(starts[1:]) + [len(keys)]
+        return [
+            {by: int(key_id), "graded": int(end - start), "percentiles": _pct(marks[start:end])}
+            for key_id, start, end in zip(ids, starts, bounds)
+        ]
@@ -1,38 +1,275 @@
-import os
+import sys
+
 import click
 from flask.cli import with_appcontext
 from .__init__ import create_app, db
+from .models import Instructor
+from .analytics_snapshot import export_snapshot, snapshot_dir
+from .bench import SCALES, compare, load_report, run_benchmarks, save_report, seeded_app
+from .load_test import enrollment_race
+from .migrate import MigrationError, migration_status, run_migrations
+from .plan_check import check_plans
+from .report_check import check_instructor_stats
+from .schema import create_schema
+from .seed import SEED_PASSWORD, seed_database
+from .slow_queries import slow_query_log_path, summarize
+from .summaries import refresh_stale_summaries
+from .templating import bytecode_cache_dir, precompile_templates
 
 app = create_app()
 
 
 @click.command("init-db")
+@click.option("--from-models", is_flag=True,
+              help="Build the schema from the SQLAlchemy models even on Postgres (fresh databases).")
 @with_appcontext
-def init_db_command():
-    """Initialize / migrate DB schema using schema.sql.
+def init_db_command(from_models):
+    """Initialize / migrate DB schema.
 
-    This uses a raw DB-API cursor so Postgres can execute the full script,
-    which may contain multiple statements, DO $$ blocks, views, etc.
+    On Postgres this applies the pending versioned migrations (see
+    migrate.py), so existing databases are upgraded in place. Other
+    backends, e.g. SQLite, get the portable schema built from the models.
     """
 
-    schema_path = os.path.join(os.path.dirname(__file__), "schema.sql")
-    with open(schema_path, "r", encoding="utf-8") as f:
-        sql_script = f.read()
+    if from_models or db.engine.dialect.name != "postgresql":
+        create_schema()
+        click.echo(f"Initialized the database from the models ({db.engine.dialect.name}).")
+        return
 
-    conn = db.engine.raw_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(sql_script)
-        conn.commit()
-        click.echo("Initialized the database (schema.sql applied).")
-    finally:
+    _apply_migrations(dry_run=False)
+
+
+@click.command("migrate")
+@click.option("--dry-run", is_flag=True, help="List pending migrations without applying them.")
+@click.option("--status", is_flag=True, help="Show every migration and whether it is applied.")
+@with_appcontext
+def migrate_command(dry_run, status):
+    """Apply pending schema migrations (Postgres)."""
+
+    if status:
         try:
-            conn.close()
-        except Exception:
-            pass
+            rows = migration_status()
+        except MigrationError as e:
+            raise click.ClickException(str(e))
+        for m, applied in rows:
+            click.echo(f"{'applied ' if applied else 'pending '} {m.version:04d} {m.name}")
+        return
+
+    _apply_migrations(dry_run=dry_run)
+
+
+def _apply_migrations(dry_run):
+    try:
+        done = run_migrations(dry_run=dry_run, echo=click.echo)
+    except MigrationError as e:
+        raise click.ClickException(str(e))
+    if not dry_run:
+        click.echo(f"Applied {len(done)} migration(s); schema is up to date.")
+
+
+@click.command("analytics-snapshot")
+@click.option("--output", default=None, help="Target directory (defaults to ANALYTICS_SNAPSHOT_DIR).")
+@with_appcontext
+def analytics_snapshot_command(output):
+    """Export enrollments into the memory-mapped NumPy analytics snapshot."""
+
+    directory = output or snapshot_dir(app)
+    rows = export_snapshot(directory)
+    click.echo(f"Exported {rows} enrollments to {directory}.")
+
+
+@click.command("refresh-summaries")
+@with_appcontext
+def refresh_summaries_command():
+    """Rebuild student summaries whose next due date has passed (run daily)."""
+
+    refreshed = refresh_stale_summaries(db.session)
+    db.session.commit()
+    click.echo(f"Refreshed {refreshed} student summaries.")
+
+
+@click.command("slow-queries")
+@click.option("--limit", default=20, show_default=True, help="Number of statements to show.")
+@click.option("--explain/--no-explain", default=False, help="Print the captured plan for each statement.")
+def slow_queries_command(limit, explain):
+    """Summarize the slow-query log: top statements by total time."""
+
+    path = slow_query_log_path(app)
+    top = summarize(path, limit=limit)
+    if not top:
+        click.echo(f"No slow queries recorded in {path}.")
+        return
+
+    for i, row in enumerate(top, 1):
+        endpoints = ", ".join(f"{e} x{n}" for e, n in list(row["endpoints"].items())[:3])
+        click.echo(
+            f"{i:>2}. total {row['total_ms']:.0f} ms | {row['count']} runs | "
+            f"mean {row['mean_ms']:.1f} ms | max {row['max_ms']:.1f} ms | {endpoints}"
+        )
+        click.echo(f"    {row['fingerprint'][:200]}")
+        if explain and row["explain"]:
+            for line in row["explain"].splitlines():
+                click.echo(f"      {line}")
+
+
+@click.command("seed")
+@click.option("--universities", default=10, show_default=True)
+@click.option("--courses", default=200, show_default=True)
+@click.option("--instructors", default=100, show_default=True)
+@click.option("--students", default=5000, show_default=True)
+@click.option("--enrollments-per-student", default=4.0, show_default=True, help="Mean courses per student.")
+@click.option("--zipf", "zipf_s", default=1.1, show_default=True, help="Zipf exponent for course popularity.")
+@click.option("--outline-alpha", default=1.5, show_default=True, help="Pareto shape for outline sizes (smaller = more skew).")
+@click.option("--max-modules", default=12, show_default=True)
+@click.option("--graded-fraction", default=0.7, show_default=True)
+@click.option("--dereg-fraction", default=0.01, show_default=True)
+@click.option("--seed", default=42, show_default=True, help="Random seed; the same seed gives the same data.")
+@click.option("--batch-size", default=10000, show_default=True)
+@with_appcontext
+def seed_command(**options):
+    """Generate a synthetic tenant for load testing."""
+
+    result = seed_database(**options)
+    for table, count in result["tables"].items():
+        click.echo(f"  {table:<25} {count:>10}")
+    click.echo(
+        f"Inserted {result['rows']} rows in {result['seconds']} s "
+        f"({result['rows_per_second']} rows/s). All seeded users use password '{SEED_PASSWORD}'."
+    )
+
+
+@click.command("bench")
+@click.option("--scale", "scales", multiple=True, type=click.Choice(list(SCALES)),
+              default=["small"], show_default=True, help="Data scale(s) to run; repeatable.")
+@click.option("--iterations", default=20, show_default=True, help="Timed requests per route.")
+@click.option("--database-url", default=None,
+              help="Scratch database URI ({scale} is substituted). It is DROPPED and recreated. "
+                   "Defaults to an in-memory SQLite database.")
+@click.option("--output", default="bench_results.json", show_default=True)
+@click.option("--baseline", default=None, help="Previous results to compare against.")
+@click.option("--threshold", default=0.2, show_default=True, help="Allowed relative slowdown before failing.")
+def bench_command(scales, iterations, database_url, output, baseline, threshold):
+    """Benchmark every route of every blueprint at several data scales."""
+
+    database_url = database_url or "sqlite://"
+    report = run_benchmarks(create_app, database_url, scales, iterations=iterations)
+    save_report(report, output)
+
+    for scale, data in report["scales"].items():
+        click.echo(f"[{scale}] {data['seeded_rows']} seeded rows")
+        for endpoint, r in data["routes"].items():
+            if "skipped" in r:
+                click.echo(f"  {endpoint:<40} skipped ({r['skipped']})")
+            else:
+                click.echo(
+                    f"  {endpoint:<40} {r['status']} p50 {r['p50_ms']:>8.2f} ms  "
+                    f"p99 {r['p99_ms']:>8.2f} ms  {r['requests_per_second']:>7} req/s  "
+                    f"{r['queries']} queries"
+                )
+    click.echo(f"Results written to {output}.")
+
+    if baseline:
+        regressions = compare(load_report(baseline), report, threshold=threshold)
+        if regressions:
+            click.echo(f"{len(regressions)} regression(s) beyond {threshold:.0%}:")
+            for line in regressions:
+                click.echo(f"  {line}")
+            sys.exit(1)
+        click.echo("No regressions.")
+
+
+@click.command("check-plans")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="small", show_default=True)
+@click.option("--min-rows", default=100, show_default=True, help="Tables at least this big must not be full-scanned.")
+@click.option("--database-url", default="sqlite://", show_default=True,
+              help="Scratch database URI; it is DROPPED and recreated.")
+def check_plans_command(scale, min_rows, database_url):
+    """EXPLAIN every route's queries on a seeded database; fail on full scans of large tables."""
+
+    scratch_app, _ = seeded_app(create_app, database_url, scale)
+    problems, checked = check_plans(scratch_app, min_rows=min_rows)
+    for p in problems:
+        click.echo(f"{p['endpoint']}: {p['table']} ({p['rows']} rows) {p['detail']}")
+        click.echo(f"    {p['statement'][:300]}")
+    if problems:
+        click.echo(f"{len(problems)} full scan(s) in {checked} statements.")
+        sys.exit(1)
+    click.echo(f"{checked} statements checked; no full scans of large tables.")
+
+
+@click.command("check-reports")
+@click.option("--scale", type=click.Choice(list(SCALES)), default="small", show_default=True)
+@click.option("--database-url", default="sqlite://", show_default=True,
+              help="Scratch database URI; it is DROPPED and recreated.")
+def check_reports_command(scale, database_url):
+    """Compare the analyst instructor report with a brute-force count on seeded data."""
+
+    scratch_app, _ = seeded_app(create_app, database_url, scale)
+    with scratch_app.app_context():
+        # Always cover the outer-join path: an instructor with no courses.
+        db.session.add(Instructor(
+            username="check-reports-idle", email="check-reports-idle@example.com",
+            password_hash="!", first_name="Idle", role="instructor",
+        ))
+        db.session.commit()
+        problems, checked = check_instructor_stats()
+    for problem in problems:
+        click.echo(problem)
+    if problems:
+        click.echo(f"{len(problems)} mismatch(es) across {checked} instructors.")
+        sys.exit(1)
+    click.echo(f"{checked} instructors match the brute-force counts.")
+
+
+@click.command("load-test-enrollment")
+@click.option("--enrollers", default=500, show_default=True, help="Students enrolling at the same moment.")
+@click.option("--capacity", default=50, show_default=True, help="Seats in the contested course.")
+@click.option("--connections", default=50, show_default=True, help="Database connections shared by the enrollers.")
+@click.option("--database-url", default=None,
+              help="Scratch database URI; it is DROPPED and recreated. Defaults to a temporary SQLite file.")
+def load_test_enrollment_command(enrollers, capacity, connections, database_url):
+    """Race many students for a few seats and check nobody is overbooked."""
+
+    report = enrollment_race(
+        create_app, database_url, enrollers=enrollers, capacity=capacity, connections=connections
+    )
+    click.echo(
+        f"{report['enrollers']} enrollers, {report['capacity']} seats: {report['enrolled']} enrolled, "
+        f"{report['waitlisted']} waitlisted, seats_taken {report['seats_taken']} "
+        f"in {report['seconds']} s (p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms)"
+    )
+    for problem in report["problems"]:
+        click.echo(f"  {problem}")
+    if report["problems"]:
+        sys.exit(1)
+    click.echo("No overbooking.")
+
+
+@click.command("precompile-templates")
+def precompile_templates_command():
+    """Compile every template into the Jinja bytecode cache."""
+
+    directory = bytecode_cache_dir(app)
+    if not directory:
+        raise click.ClickException("JINJA_BYTECODE_CACHE_DIR is disabled; nothing to warm.")
+    timings = precompile_templates(app)
+    slowest = sorted(timings.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    for name, ms in slowest:
+        click.echo(f"  {name:<45} {ms:8.1f} ms")
+    click.echo(f"Compiled {len(timings)} templates in {sum(timings.values()):.0f} ms into {directory}.")
 
 
 app.cli.add_command(init_db_command)
+app.cli.add_command(migrate_command)
+app.cli.add_command(analytics_snapshot_command)
+app.cli.add_command(refresh_summaries_command)
+app.cli.add_command(slow_queries_command)
+app.cli.add_command(seed_command)
+app.cli.add_command(bench_command)
+app.cli.add_command(check_plans_command)
+app.cli.add_command(check_reports_command)
+app.cli.add_command(precompile_templates_command)
+app.cli.add_command(load_test_enrollment_command)
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,252 @@
+"""
+Route-level benchmarks.
+
+For each data scale a throwaway database is (re)created and seeded with
+`seed_database`. Then every GET route of the auth, main, student,
+instructor, admin and analyst blueprints is requested through the Flask
+test client, logged in as the matching role. For each route we record
+throughput, p50/p99 latency and the SQL query count (from the Server-Timing
+header).
+
+Results are written as JSON; `compare` diffs two result files and reports
+routes that got slower (or run more queries) beyond a threshold.
+
+The target database is DROPPED and recreated for every scale - only point
+it at a scratch database.
+"""
+
+import json
+import platform
+import re
+import time
+from datetime import datetime
+
+from flask import url_for
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+
+from .models import (
+    db,
+    Admin,
+    Analyst,
+    Course,
+    Enrollment,
+    Instructor,
+    course_instructors,
+)
+from .schema import create_schema, drop_schema
+from .seed import SEED_PASSWORD, seed_database
+
+
+SCALES = {
+    "small": dict(universities=3, courses=20, instructors=10, students=200),
+    "medium": dict(universities=10, courses=200, instructors=100, students=5000),
+    "large": dict(universities=50, courses=2000, instructors=800, students=50000),
+}
+
+BLUEPRINT_ROLES = {
+    "auth": "student",
+    "main": "student",
+    "student": "student",
+    "instructor": "instructor",
+    "admin": "admin",
+    "analyst": "analyst",
+}
+
+# Routes that change the session or are not worth timing.
+SKIP_ENDPOINTS = {"auth.logout", "main.favicon"}
+
+_SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+def bench_users():
+    """Usernames for each role, creating admin/analyst accounts if needed."""
+    hashed = generate_password_hash(SEED_PASSWORD, method="pbkdf2:sha256")
+    for model, role in ((Admin, "admin"), (Analyst, "analyst")):
+        if not model.query.filter_by(username=f"bench_{role}").first():
+            db.session.add(model(
+                username=f"bench_{role}", email=f"bench_{role}@example.com",
+                password_hash=hashed, first_name="Bench", last_name=role.title(), role=role,
+            ))
+    db.session.commit()
+
+    # The busiest student and instructor give the heaviest realistic pages.
+    student_id, student_course = (
+        db.session.query(Enrollment.student_id, func.min(Enrollment.course_id))
+        .group_by(Enrollment.student_id)
+        .order_by(func.count().desc())
+        .first()
+    )
+    instructor_id, instructor_course = (
+        db.session.query(course_instructors.c.instructor_id, func.min(course_instructors.c.course_id))
+        .group_by(course_instructors.c.instructor_id)
+        .order_by(func.count().desc())
+        .first()
+    )
+    busiest_course = (
+        db.session.query(Enrollment.course_id)
+        .group_by(Enrollment.course_id)
+        .order_by(func.count().desc())
+        .limit(1)
+        .scalar()
+    ) or db.session.query(func.min(Course.course_id)).scalar()
+
+    return {
+        "student": (f"seed_student_{student_id}", {"course_id": student_course}),
+        "instructor": (db.session.get(Instructor, instructor_id).username, {"course_id": instructor_course}),
+        "admin": ("bench_admin", {"course_id": busiest_course}),
+        "analyst": ("bench_analyst", {"course_id": busiest_course, "key": "course_id"}),
+    }
+
+
+def _routes(app):
+    """(endpoint, rule) for every benchmarked GET route."""
+    for rule in app.url_map.iter_rules():
+        blueprint = rule.endpoint.split(".", 1)[0]
+        if blueprint not in BLUEPRINT_ROLES or rule.endpoint in SKIP_ENDPOINTS:
+            continue
+        if "GET" not in rule.methods:
+            continue
+        yield rule.endpoint, rule
+
+
+def login_clients(app, users):
+    """A logged-in test client per role."""
+    clients = {}
+    for role, (username, _) in users.items():
+        client = app.test_client()
+        client.post("/login", data={"email_username": username, "password": SEED_PASSWORD})
+        clients[role] = client
+    return clients
+
+
+def route_urls(app, users):
+    """(endpoint, role, url, skip reason) for every benchmarked route."""
+    for endpoint, rule in sorted(_routes(app), key=lambda r: r[0]):
+        role = BLUEPRINT_ROLES[endpoint.split(".", 1)[0]]
+        values = users[role][1]
+        if any(arg not in values for arg in rule.arguments):
+            yield endpoint, role, None, f"no value for {sorted(rule.arguments)}"
+            continue
+        with app.test_request_context():
+            url = url_for(endpoint, **{a: values[a] for a in rule.arguments})
+        yield endpoint, role, url, None
+
+
+def run_scale(app, iterations=20, warmup=2):
+    """Benchmark every route against the database `app` is bound to."""
+    with app.app_context():
+        users = bench_users()
+    clients = login_clients(app, users)
+
+    results = {}
+    for endpoint, role, url, skipped in route_urls(app, users):
+        if skipped:
+            results[endpoint] = {"skipped": skipped}
+            continue
+
+        client = clients[role]
+        for _ in range(warmup):
+            client.get(url)
+
+        latencies = []
+        status = None
+        queries = None
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            resp = client.get(url)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            status = resp.status_code
+            match = _SERVER_TIMING_QUERIES.search(resp.headers.get("Server-Timing", ""))
+            queries = int(match.group(1)) if match else None
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        results[endpoint] = {
+            "url": url,
+            "role": role,
+            "status": status,
+            "requests_per_second": round(iterations / elapsed, 1) if elapsed else None,
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "queries": queries,
+        }
+    return results
+
+
+def seeded_app(create_app, database_url, scale, seed=42):
+    """An app bound to `database_url`, rebuilt and seeded at `scale`."""
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SLOW_QUERY_THRESHOLD_MS": None,
+        "PROFILE_SAMPLE_RATE": 0.0,
+    })
+    with app.app_context():
+        drop_schema()
+        create_schema()
+        seeded = seed_database(seed=seed, **SCALES[scale])
+    return app, seeded
+
+
+def run_benchmarks(create_app, database_url, scales, iterations=20, seed=42):
+    """Seed a fresh database per scale and benchmark it; returns the report dict."""
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "iterations": iterations,
+            "seed": seed,
+        },
+        "scales": {},
+    }
+
+    for scale in scales:
+        app, seeded = seeded_app(create_app, database_url.format(scale=scale), scale, seed=seed)
+        report["scales"][scale] = {
+            "seeded_rows": seeded["rows"],
+            "routes": run_scale(app, iterations=iterations),
+        }
+        with app.app_context():
+            db.engine.dispose()
+
+    return report
+
+
+def compare(baseline, current, threshold=0.2):
+    """Routes whose p50/p99 grew by more than `threshold` or whose query count rose."""
+    regressions = []
+    for scale, data in current["scales"].items():
+        base_routes = baseline.get("scales", {}).get(scale, {}).get("routes", {})
+        for endpoint, cur in data["routes"].items():
+            base = base_routes.get(endpoint)
+            if not base or "skipped" in cur or "skipped" in base:
+                continue
+            for metric in ("p50_ms", "p99_ms"):
+                if base[metric] and cur[metric] > base[metric] * (1 + threshold):
+                    regressions.append(
+                        f"{scale} {endpoint}: {metric} {base[metric]:.2f} -> {cur[metric]:.2f}"
+                    )
+            if base.get("queries") is not None and cur.get("queries") is not None \
+                    and cur["queries"] > base["queries"]:
+                regressions.append(
+                    f"{scale} {endpoint}: queries {base['queries']} -> {cur['queries']}"
+                )
+    return regressions
+
+
+def load_report(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
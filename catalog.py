@@ -0,0 +1,151 @@
+"""
+Course catalog queries for student.explore_courses.
+
+Every page costs the same however many courses there are:
+  - the course page is a keyset query on the unique course_name
+    (`course_name > :after ORDER BY course_name LIMIT n`), with the
+    student's enrollment resolved by an outer join in the same statement;
+  - facet counts (university, country, course type, duration band) come
+    from one UNION ALL of grouped selects. Each facet is counted with all
+    *other* active filters applied, so picking a value never hides its
+    siblings. Counts are cached per catalog version and filter set.
+"""
+
+from flask import current_app
+from sqlalchemy import String, and_, case, cast, func, literal, null, union_all
+
+from .http_cache import CATALOG, data_version_stamp
+from .models import db, Course, Enrollment, University, course_type_enum
+
+
+COURSES_PER_PAGE = 24
+
+COURSE_TYPES = list(course_type_enum.enums)
+
+# (key, label, min weeks, max weeks); None means unbounded.
+DURATION_BANDS = [
+    ("short", "Up to 4 weeks", None, 4),
+    ("medium", "5 - 12 weeks", 5, 12),
+    ("long", "13 - 26 weeks", 13, 26),
+    ("extended", "Over 26 weeks", 27, None),
+]
+
+
+def parse_filters(args):
+    """Catalog filters from the query string (invalid values are dropped)."""
+    min_weeks = args.get("min_weeks", type=int)
+    max_weeks = args.get("max_weeks", type=int)
+    return {
+        "uni": sorted(set(args.getlist("uni", type=int))),
+        "country": sorted({c for c in args.getlist("country") if c}),
+        "type": sorted({t for t in args.getlist("type") if t in COURSE_TYPES}),
+        "min_weeks": min_weeks if min_weeks is not None and min_weeks >= 0 else None,
+        "max_weeks": max_weeks if max_weeks is not None and max_weeks >= 0 else None,
+    }
+
+
+def _conditions(filters, exclude=None):
+    conds = []
+    if filters["uni"] and exclude != "uni":
+        conds.append(Course.uni_id.in_(filters["uni"]))
+    if filters["country"] and exclude != "country":
+        conds.append(University.country.in_(filters["country"]))
+    if filters["type"] and exclude != "type":
+        conds.append(Course.c_type.in_(filters["type"]))
+    if exclude != "duration":
+        if filters["min_weeks"] is not None:
+            conds.append(Course.duration_weeks >= filters["min_weeks"])
+        if filters["max_weeks"] is not None:
+            conds.append(Course.duration_weeks <= filters["max_weeks"])
+    return conds
+
+
+def _duration_band():
+    whens = []
+    for key, _, low, high in DURATION_BANDS:
+        cond = []
+        if low is not None:
+            cond.append(Course.duration_weeks >= low)
+        if high is not None:
+            cond.append(Course.duration_weeks <= high)
+        whens.append((and_(*cond), key))
+    return case(*whens, else_=None)
+
+
+def _facet_counts(filters):
+    def grouped(facet, column=None):
+        select = (
+            db.select(
+                literal(facet).label("facet"),
+                (cast(column, String) if column is not None else null()).label("value"),
+                func.count().label("n"),
+            )
+            .select_from(Course)
+            .join(University, University.uni_id == Course.uni_id)
+            .where(*_conditions(filters, exclude=facet))
+        )
+        return select.group_by(column) if column is not None else select
+
+    stmt = union_all(
+        grouped("total"),
+        grouped("uni", Course.uni_id),
+        grouped("country", University.country),
+        grouped("type", Course.c_type),
+        grouped("duration", _duration_band()),
+    )
+
+    facets = {"total": 0, "uni": {}, "country": {}, "type": {}, "duration": {}}
+    for facet, value, n in db.session.execute(stmt):
+        if facet == "total":
+            facets["total"] = n
+        elif value is not None:
+            facets[facet][value] = n
+    return facets
+
+
+def catalog_facets(filters):
+    """Facet counts plus university names, cached per catalog version."""
+    version = data_version_stamp(CATALOG)[0]
+    key = ("catalog_facets", version, repr(sorted(filters.items())))
+
+    def compute():
+        counts = _facet_counts(filters)
+        uni_ids = [int(u) for u in counts["uni"]]
+        names = dict(
+            db.session.query(University.uni_id, University.uni_name)
+            .filter(University.uni_id.in_(uni_ids))
+        ) if uni_ids else {}
+        return {
+            "uni": sorted(
+                ((int(u), names.get(int(u), u), n) for u, n in counts["uni"].items()),
+                key=lambda row: row[1],
+            ),
+            "country": sorted(counts["country"].items()),
+            "type": [(t, counts["type"].get(t, 0)) for t in COURSE_TYPES],
+            "duration": [
+                (key_, label, low, high, counts["duration"].get(key_, 0))
+                for key_, label, low, high in DURATION_BANDS
+            ],
+            "total": counts["total"],
+        }
+
+    return current_app.extensions["fragment_cache"].get_or_render(key, compute)
+
+
+def catalog_page(filters, student_id, after=None, per_page=COURSES_PER_PAGE):
+    """[(course, university, enrolled)] after `after` (a course_name), and the next cursor."""
+    q = (
+        db.session.query(Course, University, Enrollment.student_id.isnot(None).label("enrolled"))
+        .join(University, University.uni_id == Course.uni_id)
+        .outerjoin(
+            Enrollment,
+            and_(Enrollment.course_id == Course.course_id, Enrollment.student_id == student_id),
+        )
+        .filter(*_conditions(filters))
+    )
+    if after:
+        q = q.filter(Course.course_name > after)
+    rows = q.order_by(Course.course_name).limit(per_page + 1).all()
+
+    next_cursor = rows[per_page - 1][0].course_name if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
@@ -0,0 +1,212 @@
+"""
+Upcoming assignment deadlines for a student.
+
+Subtopic and topic assignments are reached from the student's
+enrollments in one UNION ALL:
+
+    enrollments -> coursemodules -> moduletopics [-> topicsubtopics] -> assignments
+
+The last hop uses the (subtopic_id, due_date) / (topic_id, due_date)
+indexes, so only dated rows in range are read. The result is ordered by
+due_date.
+
+The list is cached per student in the fragment-cache LRU (see
+fragment_cache.py). The key holds a stamp that changes whenever an
+assignment or enrollment does:
+- the student's enrollment count and latest enrollments.updated_at;
+- the sum of their courses' outline_version, which every assignment add,
+  edit or delete bumps.
+The day is part of the key too, since "upcoming" moves with it.
+
+Students can subscribe to the list as an iCalendar feed. A calendar app
+can't log in, so the feed URL carries a signed token for the student
+instead of a session. The token also signs the student's feed_secret, so
+resetting the secret (reset_feed_secret) revokes every link issued
+before. Students who never reset have no secret; their tokens, including
+the bare-id ones issued before feed_secret existed, stay valid until
+they do.
+"""
+
+import hmac
+import secrets
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func, literal, null, select, union_all
+
+from .models import (
+    db,
+    Course,
+    CourseModule,
+    Enrollment,
+    ModuleTopic,
+    Student,
+    SubtopicAssignment,
+    TopicAssignment,
+    TopicSubtopic,
+)
+
+
+DASHBOARD_DEADLINES = 5
+FEED_PAST_DAYS = 30
+FEED_LIMIT = 500
+
+_FEED_SALT = "deadlines-feed"
+
+
+def upcoming_deadlines(student_id, since=None, limit=None):
+    """Assignments due on or after `since` in the student's courses, soonest first."""
+    since = since or date.today()
+
+    def branch(kind, assignment, join_to_topic, subtopic_title):
+        stmt = (
+            select(
+                literal(kind).label("kind"),
+                assignment.assignment_id.label("assignment_id"),
+                assignment.title.label("title"),
+                assignment.description.label("description"),
+                assignment.due_date.label("due_date"),
+                Course.course_id.label("course_id"),
+                Course.course_name.label("course_name"),
+                CourseModule.module_title.label("module_title"),
+                ModuleTopic.topic_title.label("topic_title"),
+                subtopic_title.label("subtopic_title"),
+            )
+            .select_from(Enrollment)
+            .join(Course, Course.course_id == Enrollment.course_id)
+            .join(CourseModule, CourseModule.course_id == Enrollment.course_id)
+            .join(ModuleTopic, ModuleTopic.module_id == CourseModule.module_id)
+        )
+        for target, onclause in join_to_topic:
+            stmt = stmt.join(target, onclause)
+        return stmt.where(Enrollment.student_id == student_id, assignment.due_date >= since)
+
+    stmt = union_all(
+        branch(
+            "subtopic", SubtopicAssignment,
+            [
+                (TopicSubtopic, TopicSubtopic.topic_id == ModuleTopic.topic_id),
+                (SubtopicAssignment, SubtopicAssignment.subtopic_id == TopicSubtopic.subtopic_id),
+            ],
+            TopicSubtopic.subtopic_title,
+        ),
+        branch(
+            "topic", TopicAssignment,
+            [(TopicAssignment, TopicAssignment.topic_id == ModuleTopic.topic_id)],
+            null(),
+        ),
+    ).subquery()
+
+    query = select(stmt).order_by(stmt.c.due_date, stmt.c.course_name, stmt.c.kind, stmt.c.assignment_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return [row._asdict() for row in db.session.execute(query)]
+
+
+def deadlines_stamp(student_id):
+    """Changes whenever the student's enrollments or their courses' assignments do."""
+    count, latest, versions = db.session.execute(
+        select(func.count(), func.max(Enrollment.updated_at), func.sum(Course.outline_version))
+        .select_from(Enrollment)
+        .join(Course, Course.course_id == Enrollment.course_id)
+        .where(Enrollment.student_id == student_id)
+    ).one()
+    return (student_id, count, latest, versions), latest
+
+
+def cached_deadlines(student_id, since=None, limit=None):
+    """upcoming_deadlines, cached until an assignment or enrollment changes."""
+    since = since or date.today()
+    stamp, _ = deadlines_stamp(student_id)
+    key = ("deadlines", stamp, since, limit)
+    return current_app.extensions["fragment_cache"].get_or_render(
+        key, lambda: upcoming_deadlines(student_id, since=since, limit=limit)
+    )
+
+
+# --- iCalendar feed ---
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=_FEED_SALT)
+
+
+def feed_token(student):
+    return _serializer().dumps([student.user_id, student.feed_secret])
+
+
+def student_for_token(token):
+    """The student id a feed token was issued for, or None if it is invalid or revoked."""
+    try:
+        payload = _serializer().loads(token)
+    except BadSignature:
+        return None
+    student_id, secret = payload if isinstance(payload, list) else (payload, None)
+
+    current = db.session.execute(
+        select(Student.feed_secret).where(Student.user_id == student_id)
+    ).first()
+    if current is None or not hmac.compare_digest(current.feed_secret or "", secret or ""):
+        return None
+    return student_id
+
+
+def reset_feed_secret(student):
+    """Give the student a new feed secret; links issued before stop working."""
+    student.feed_secret = secrets.token_urlsafe(16)
+
+
+def _ical_text(value):
+    return (
+        str(value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line):
+    """Fold a content line at 75 octets (RFC 5545, 3.1)."""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(data):
+        end = min(len(data), start + (75 if not parts else 74))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1  # don't split a UTF-8 sequence
+        parts.append(data[start:end].decode("utf-8"))
+        start = end
+    return "\r\n ".join(parts)
+
+
+def to_ical(deadlines, calendar_name="EduHub deadlines"):
+    """Render deadlines as an iCalendar document of all-day events."""
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    host = current_app.config.get("SERVER_NAME") or "eduhub"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//EduHub//Deadlines//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_ical_text(calendar_name)}",
+    ]
+    for d in deadlines:
+        where = " / ".join(filter(None, (d["module_title"], d["topic_title"], d["subtopic_title"])))
+        description = "\n".join(filter(None, (f"{d['course_name']}: {where}", d["description"])))
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{d['kind']}-assignment-{d['assignment_id']}@{host}",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{d['due_date'].strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(d['due_date'] + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_ical_text(d['title'] + ' (' + d['course_name'] + ')')}",
+            f"DESCRIPTION:{_ical_text(description)}",
+            "TRANSP:TRANSPARENT",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
@@ -0,0 +1,307 @@
+"""
+Enrolling students into courses.
+
+Courses may have a `capacity`. `courses.seats_taken` is the row-level seat
+counter, and a seat is claimed with one conditional UPDATE:
+
+    UPDATE courses SET seats_taken = seats_taken + 1
+    WHERE course_id IN (...)
+      AND (capacity IS NULL OR seats_taken < capacity)
+      AND NOT EXISTS (<enrollment of this student>)
+    RETURNING course_id
+
+Concurrent enrollers in the same course queue on that course's row lock
+only. Each one re-checks `seats_taken < capacity` against the committed
+count, so a course cannot be overbooked and other courses are never
+blocked. A cart locks its course rows in id order first
+(SELECT ... FOR UPDATE), so overlapping carts can't deadlock.
+
+The claimed courses are then inserted in one statement:
+
+    INSERT INTO enrollments ... ON CONFLICT DO NOTHING RETURNING course_id
+
+A seat claimed by a request that loses a same-student race is given back.
+Courses without a free seat put the student on `course_waitlist`.
+Courses whose prerequisites the student hasn't passed are refused by the
+same UPDATE (one closure lookup, see prerequisites.py). Missing,
+already-enrolled, ineligible and full courses are told apart with one
+extra query, which runs only when something was not enrolled.
+
+ORM changes are kept consistent by flush hooks:
+- enrollments added through the ORM (admin) take a seat;
+- deleted enrollments (unenroll, approved deregistrations, admin) free
+  theirs;
+- raised or removed capacities promote waitlisted students in FIFO
+  order, in the same transaction. Waitlisted students who no longer meet
+  a prerequisite are passed over and stay on the waitlist.
+
+Core inserts bypass the ORM flush hooks, so affected summary rows are
+rebuilt here (see summaries.py) and the "enrollments" data version is
+bumped here (see http_cache.py).
+"""
+
+from collections import Counter
+
+from sqlalchemy import case, delete, event, exists, func, literal, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .http_cache import ENROLLMENTS, bump_data_version
+from .models import db, Course, CourseWaitlist, Enrollment
+from .prerequisites import missing_prerequisites_clause
+from .summaries import refresh_student_summaries
+
+
+ENROLLED = "enrolled"
+ALREADY_ENROLLED = "already_enrolled"
+WAITLISTED = "waitlisted"
+MISSING_PREREQUISITES = "missing_prerequisites"
+NOT_FOUND = "not_found"
+
+MAX_CART_COURSES = 50
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_courses = Course.__table__
+_enrollments = Enrollment.__table__
+_waitlist = CourseWaitlist.__table__
+
+
+def _insert(session, table):
+    return _INSERTS[session.get_bind().dialect.name](table)
+
+
+def _has_room():
+    return or_(_courses.c.capacity.is_(None), _courses.c.seats_taken < _courses.c.capacity)
+
+
+def _release_seats(session, course_counts):
+    for course_id, n in course_counts.items():
+        session.execute(
+            update(_courses)
+            .where(_courses.c.course_id == course_id)
+            .values(seats_taken=case(
+                (_courses.c.seats_taken > n, _courses.c.seats_taken - n), else_=0
+            ))
+        )
+
+
+def enroll_courses(student_id, course_ids):
+    """Enroll `student_id` in `course_ids`; returns {course_id: result}.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    session = db.session
+    course_ids = sorted(set(course_ids))
+    if not course_ids:
+        return {}
+
+    if len(course_ids) > 1:
+        session.execute(
+            select(_courses.c.course_id)
+            .where(_courses.c.course_id.in_(course_ids))
+            .order_by(_courses.c.course_id)
+            .with_for_update()
+        )
+
+    already = exists().where(
+        _enrollments.c.student_id == student_id,
+        _enrollments.c.course_id == _courses.c.course_id,
+    )
+    blocked = missing_prerequisites_clause(student_id, _courses.c.course_id)
+    claimed = set(session.scalars(
+        update(_courses)
+        .where(_courses.c.course_id.in_(course_ids), _has_room(), ~already, ~blocked)
+        .values(seats_taken=_courses.c.seats_taken + 1)
+        .returning(_courses.c.course_id)
+    ))
+
+    enrolled = set()
+    if claimed:
+        enrolled = set(session.scalars(
+            _insert(session, _enrollments)
+            .values([{"student_id": student_id, "course_id": c} for c in sorted(claimed)])
+            .on_conflict_do_nothing(index_elements=["student_id", "course_id"])
+            .returning(_enrollments.c.course_id)
+        ))
+        lost = claimed - enrolled
+        if lost:
+            _release_seats(session, Counter(lost))
+            _promote_waitlisted(session, lost)
+
+    results = {course_id: ENROLLED for course_id in enrolled}
+    skipped = [course_id for course_id in course_ids if course_id not in enrolled]
+    if skipped:
+        rows = session.execute(
+            select(_courses.c.course_id, already.label("enrolled"), blocked.label("blocked"))
+            .where(_courses.c.course_id.in_(skipped))
+        ).all()
+        for course_id, is_enrolled, is_blocked in rows:
+            if is_enrolled:
+                results[course_id] = ALREADY_ENROLLED
+            elif is_blocked:
+                results[course_id] = MISSING_PREREQUISITES
+        full = [course_id for course_id, is_enrolled, is_blocked in rows if not (is_enrolled or is_blocked)]
+        if full:
+            session.execute(
+                _insert(session, _waitlist)
+                .values([{"course_id": c, "student_id": student_id} for c in full])
+                .on_conflict_do_nothing(index_elements=["course_id", "student_id"])
+            )
+        results.update({course_id: WAITLISTED for course_id in full})
+        for course_id in skipped:
+            results.setdefault(course_id, NOT_FOUND)
+
+    if enrolled:
+        session.execute(
+            delete(_waitlist).where(
+                _waitlist.c.student_id == student_id, _waitlist.c.course_id.in_(enrolled)
+            )
+        )
+        refresh_student_summaries(session, [student_id])
+        bump_data_version(session, ENROLLMENTS)
+    return results
+
+
+def _promote_waitlisted(session, course_ids):
+    """Fill free seats in `course_ids` from their waitlists; returns promoted student ids.
+
+    Set-based: per course one INSERT ... SELECT takes the first `free`
+    eligible waitlist rows, then one DELETE and one UPDATE settle the
+    waitlist and the seat counter, however long the waitlist is.
+    """
+    rows = session.execute(
+        select(_courses.c.course_id, _courses.c.capacity, _courses.c.seats_taken)
+        .where(_courses.c.course_id.in_(sorted(course_ids)))
+        .order_by(_courses.c.course_id)
+        .with_for_update()
+    ).all()
+
+    promoted = set()
+    for course_id, capacity, seats_taken in rows:
+        # Unlimited courses (capacity NULL) take the whole waitlist.
+        free = None if capacity is None else capacity - seats_taken
+        if free is not None and free <= 0:
+            continue
+
+        already = exists().where(
+            _enrollments.c.student_id == _waitlist.c.student_id,
+            _enrollments.c.course_id == course_id,
+        )
+        head = (
+            select(_waitlist.c.student_id, literal(course_id))
+            .where(
+                _waitlist.c.course_id == course_id,
+                ~already,
+                ~missing_prerequisites_clause(_waitlist.c.student_id, literal(course_id)),
+            )
+            .order_by(_waitlist.c.created_at, _waitlist.c.student_id)
+        )
+        if free is not None:
+            head = head.limit(free)
+        students = set(session.scalars(
+            _insert(session, _enrollments)
+            .from_select(["student_id", "course_id"], head)
+            .on_conflict_do_nothing(index_elements=["student_id", "course_id"])
+            .returning(_enrollments.c.student_id)
+        ))
+        if not students:
+            continue
+
+        session.execute(delete(_waitlist).where(
+            _waitlist.c.course_id == course_id, _waitlist.c.student_id.in_(students)
+        ))
+        session.execute(
+            update(_courses)
+            .where(_courses.c.course_id == course_id)
+            .values(seats_taken=_courses.c.seats_taken + len(students))
+        )
+        promoted |= students
+
+    if promoted:
+        refresh_student_summaries(session, sorted(promoted))
+        bump_data_version(session, ENROLLMENTS)
+    return promoted
+
+
+def leave_waitlist(student_id, course_id):
+    """Remove the student from a course's waitlist; True if they were on it."""
+    result = db.session.execute(delete(_waitlist).where(
+        _waitlist.c.student_id == student_id, _waitlist.c.course_id == course_id
+    ))
+    return result.rowcount > 0
+
+
+def waitlist_positions(student_id):
+    """[(course, position)] for every course the student is waiting for."""
+    position = func.row_number().over(
+        partition_by=CourseWaitlist.course_id,
+        order_by=(CourseWaitlist.created_at, CourseWaitlist.student_id),
+    )
+    mine = select(CourseWaitlist.course_id).where(CourseWaitlist.student_id == student_id)
+    ranked = (
+        select(CourseWaitlist.course_id, CourseWaitlist.student_id, position.label("position"))
+        .where(CourseWaitlist.course_id.in_(mine))
+        .subquery()
+    )
+    return (
+        db.session.query(Course, ranked.c.position)
+        .join(ranked, ranked.c.course_id == Course.course_id)
+        .filter(ranked.c.student_id == student_id)
+        .order_by(Course.course_name)
+        .all()
+    )
+
+
+# --- seat bookkeeping for ORM changes ---
+
+_PENDING = "enrollment_seat_changes"
+
+
+def _note_seat_changes(session, flush_context, instances):
+    taken, freed, promote = session.info.setdefault(_PENDING, (Counter(), Counter(), set()))
+
+    for obj in session.new:
+        if isinstance(obj, Enrollment):
+            taken[obj.course_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Enrollment):
+            freed[obj.course_id] += 1
+            promote.add(obj.course_id)
+    for obj in session.dirty:
+        if isinstance(obj, Course) and db.inspect(obj).attrs.capacity.history.has_changes():
+            promote.add(obj.course_id)
+
+
+def _apply_seat_changes(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    taken, freed, promote = pending
+
+    # Admin enrollments may exceed capacity; the counter still has to see them.
+    for course_id, n in taken.items():
+        session.execute(
+            update(_courses)
+            .where(_courses.c.course_id == course_id)
+            .values(seats_taken=_courses.c.seats_taken + n)
+        )
+    _release_seats(session, freed)
+    promote.discard(None)
+    if promote:
+        _promote_waitlisted(session, promote)
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING, None)
+
+
+_listeners_installed = False
+
+
+def init_enrollments(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _note_seat_changes)
+        event.listen(db.session, "after_flush", _apply_seat_changes)
+        event.listen(db.session, "after_soft_rollback", _discard_pending)
+        _listeners_installed = True
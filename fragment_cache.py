@@ -0,0 +1,193 @@
+"""
+Template fragment cache.
+
+Templates wrap expensive, mostly-static markup in
+
+    {% cache "student_outline", course.course_id, course.outline_version %}
+        ...
+    {% endcache %}
+
+The first argument names the fragment (used as the metrics label); the
+whole argument tuple is the cache key. The rendered HTML is kept in a
+per-process LRU of at most FRAGMENT_CACHE_SIZE entries (0 disables caching),
+so the nested module/topic/subtopic loops render once per course and
+outline version instead of once per request. On a miss, templates load the
+outline with `outline_modules(course_id)`: one query per level instead of
+a lazy load per module, topic and subtopic. Python callers can use the
+same LRU for computed values (see catalog.catalog_facets).
+
+`courses.outline_version` is bumped on every flush that adds, changes or
+deletes part of a course outline (modules, topics, subtopics, contents,
+assignments), which invalidates the old entries in every worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from sqlalchemy import event, update
+from sqlalchemy.orm import selectinload
+
+from .metrics import FRAGMENT_CACHE_REQUESTS, FRAGMENT_RENDER_TIME
+from .models import (
+    db,
+    Course,
+    CourseModule,
+    ModuleTopic,
+    TopicSubtopic,
+    SubtopicContent,
+    SubtopicAssignment,
+    TopicAssignment,
+)
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        name = str(key[0])
+        if self.max_entries <= 0:
+            return render()
+
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if html is not None:
+            FRAGMENT_CACHE_REQUESTS.labels(name, "hit").inc()
+            return html
+
+        FRAGMENT_CACHE_REQUESTS.labels(name, "miss").inc()
+        start = time.perf_counter()
+        html = render()
+        FRAGMENT_RENDER_TIME.labels(name).observe(time.perf_counter() - start)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FragmentCacheExtension(Extension):
+    """The `{% cache name, key... %}...{% endcache %}` tag."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render_cached", [nodes.Tuple(args, "load")]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        cache = current_app.extensions.get("fragment_cache")
+        if cache is None:
+            return caller()
+        return cache.get_or_render(key, caller)
+
+
+# --- outline loading ---
+
+def outline_modules(course_id):
+    """A course's modules with topics, subtopics, contents and assignments loaded."""
+    topics = selectinload(CourseModule.topics)
+    return (
+        CourseModule.query
+        .filter_by(course_id=course_id)
+        .order_by(CourseModule.module_order.asc(), CourseModule.module_id.asc())
+        .options(
+            topics.selectinload(ModuleTopic.subtopics).options(
+                selectinload(TopicSubtopic.contents),
+                selectinload(TopicSubtopic.assignments),
+            ),
+            topics.selectinload(ModuleTopic.assignments),
+        )
+        .all()
+    )
+
+
+# --- outline versioning ---
+
+def _outline_course_id(session, obj):
+    """Course an outline object belongs to (loading parents if needed)."""
+    if isinstance(obj, CourseModule):
+        return obj.course_id
+    if isinstance(obj, ModuleTopic):
+        module = obj.module or session.get(CourseModule, obj.module_id)
+        return module.course_id if module else None
+    if isinstance(obj, TopicAssignment):
+        topic = obj.topic or session.get(ModuleTopic, obj.topic_id)
+        return _outline_course_id(session, topic) if topic else None
+    if isinstance(obj, TopicSubtopic):
+        topic = obj.topic or session.get(ModuleTopic, obj.topic_id)
+        return _outline_course_id(session, topic) if topic else None
+    if isinstance(obj, (SubtopicContent, SubtopicAssignment)):
+        subtopic = obj.subtopic or session.get(TopicSubtopic, obj.subtopic_id)
+        return _outline_course_id(session, subtopic) if subtopic else None
+    return None
+
+
+_OUTLINE_MODELS = (CourseModule, ModuleTopic, TopicSubtopic, SubtopicContent, SubtopicAssignment, TopicAssignment)
+
+
+def _bump_outline_versions(session, flush_context, instances):
+    changed = [
+        obj
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, _OUTLINE_MODELS)
+    ]
+    if not changed:
+        return
+
+    with session.no_autoflush:
+        course_ids = {_outline_course_id(session, obj) for obj in changed}
+    course_ids.discard(None)
+    if course_ids:
+        session.execute(
+            update(Course)
+            .where(Course.course_id.in_(course_ids))
+            .values(outline_version=Course.outline_version + 1)
+            .execution_options(synchronize_session="fetch")
+        )
+
+
+_listeners_installed = False
+
+
+def init_fragment_cache(app):
+    global _listeners_installed
+    app.config.setdefault("FRAGMENT_CACHE_SIZE", 512)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    # Called inside {% cache %} blocks, so cache hits load nothing.
+    app.jinja_env.globals["outline_modules"] = outline_modules
+    app.extensions["fragment_cache"] = FragmentCache(app.config["FRAGMENT_CACHE_SIZE"])
+
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _bump_outline_versions)
+        _listeners_installed = True
@@ -0,0 +1,240 @@
+"""
+HTTP conditional GET and response compression.
+
+Views decorated with `@conditional(stamps)` answer revalidation requests
+before doing any real work. `stamps(**view_args)` returns a list of cheap
+version stamps (each a `(value, last_modified)` pair, see the *_stamp
+helpers below); together with the user, endpoint, view arguments and query
+string they form a weak ETag. When the browser's If-None-Match /
+If-Modified-Since still matches, a 304 is returned without running the
+view's queries or template.
+
+The stamps come from
+  - data_versions: one counter row per kind of change, bumped in the same
+    transaction ("catalog" for universities, courses and their materials
+    and prerequisites, instructor assignments and the instructor fields
+    course pages show; "enrollments" for enrollment inserts and deletes,
+    from the flush hook and from enrollments.py's Core statements),
+  - enrollments.updated_at, maintained on every insert and update. Stamps
+    for one student or course add their enrollment count to catch
+    deletions; the unscoped stamp uses the "enrollments" row instead of
+    counting the whole table,
+  - the highest users.user_id, which catches signups,
+  - courses.outline_version (see fragment_cache.py),
+  - the mtime of submissions.json.
+
+Responses with pending flash messages are never answered with a 304, so
+the message is not swallowed.
+
+HTML/JSON/CSS/JS responses of at least GZIP_MIN_SIZE bytes (default 1024;
+None disables) are gzip-compressed for clients that accept it.
+"""
+
+import gzip
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import request, session, current_app
+from flask_login import current_user
+from sqlalchemy import event, func, insert, update
+from werkzeug.http import is_resource_modified
+
+from .models import (
+    db,
+    Course,
+    CourseNote,
+    CourseOnlineBook,
+    CoursePrerequisite,
+    CourseVideo,
+    DataVersion,
+    Enrollment,
+    Instructor,
+    University,
+    User,
+)
+
+
+CATALOG = "catalog"
+ENROLLMENTS = "enrollments"
+
+# Changes to these bump the "catalog" version.
+CATALOG_MODELS = (University, Course, CourseVideo, CourseNote, CourseOnlineBook, CoursePrerequisite)
+
+# Instructor columns shown on course pages; edits to other user fields don't touch the catalog.
+INSTRUCTOR_CATALOG_FIELDS = ("first_name", "last_name", "bio", "phone_number")
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+}
+
+
+# --- version stamps ---
+
+def data_version_stamp(name, sess=None):
+    row = (sess or db.session).query(DataVersion.version, DataVersion.updated_at).filter(
+        DataVersion.name == name
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def enrollments_stamp(sess=None, student_id=None, course_id=None):
+    """Latest enrollment change (optionally for one student or course)."""
+    sess = sess or db.session
+    if student_id is None and course_id is None:
+        # max(updated_at) is one index probe; the version row counts inserts and deletes.
+        latest = sess.query(func.max(Enrollment.updated_at)).scalar()
+        version, _ = data_version_stamp(ENROLLMENTS, sess)
+        return (latest, version), latest
+
+    q = sess.query(func.max(Enrollment.updated_at), func.count())
+    if student_id is not None:
+        q = q.filter(Enrollment.student_id == student_id)
+    if course_id is not None:
+        q = q.filter(Enrollment.course_id == course_id)
+    latest, count = q.one()
+    # The count catches deletions, which leave no updated_at behind.
+    return (latest, count), latest
+
+
+def users_stamp(sess=None):
+    """Highest user id; changes with every signup."""
+    return (sess or db.session).query(func.max(User.user_id)).scalar(), None
+
+
+def course_stamp(course_id, sess=None):
+    version = (sess or db.session).query(Course.outline_version).filter(
+        Course.course_id == course_id
+    ).scalar()
+    return version, None
+
+
+def submissions_stamp(path="submissions.json"):
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None, None
+    return mtime, datetime.utcfromtimestamp(mtime)
+
+
+# --- conditional GET ---
+
+def conditional(stamps):
+    """Return 304 early when `stamps(**view_args)` is unchanged."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method not in ("GET", "HEAD") or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            values = stamps(**kwargs)
+            last_modified = max(
+                (lm.replace(microsecond=0) for _, lm in values if lm is not None), default=None
+            )
+            key = repr((
+                current_user.get_id() if current_user.is_authenticated else None,
+                request.endpoint,
+                sorted(kwargs.items()),
+                request.query_string,
+                [value for value, _ in values],
+            ))
+            etag = hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapped
+
+    return decorator
+
+
+# --- data_versions bookkeeping ---
+
+def bump_data_version(session, name):
+    """Bump the `name` counter in the session's transaction."""
+    now = datetime.utcnow()
+    result = session.execute(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        session.execute(insert(DataVersion).values(name=name, version=1, updated_at=now))
+
+
+def _instructor_shown_change(obj):
+    state = db.inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in INSTRUCTOR_CATALOG_FIELDS)
+
+
+def _bump_data_versions(session, flush_context, instances):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if (
+        any(isinstance(obj, CATALOG_MODELS) for obj in changed)
+        or any(isinstance(obj, Instructor) for obj in session.deleted)
+        or any(isinstance(obj, Instructor) and _instructor_shown_change(obj) for obj in session.dirty)
+    ):
+        bump_data_version(session, CATALOG)
+    if any(isinstance(obj, Enrollment) for obj in list(session.new) + list(session.deleted)):
+        bump_data_version(session, ENROLLMENTS)
+
+
+# --- compression ---
+
+def _gzip_response(response):
+    min_size = current_app.config["GZIP_MIN_SIZE"]
+    if (
+        min_size is None
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "gzip" not in request.accept_encodings
+    ):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    # A strong ETag names exact bytes; the compressed body is only equivalent.
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+_listeners_installed = False
+
+
+def init_http_cache(app):
+    global _listeners_installed
+    app.config.setdefault("GZIP_MIN_SIZE", 1024)
+    app.after_request(_gzip_response)
+
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _bump_data_versions)
+        _listeners_installed = True
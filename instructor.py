@@ -3,7 +3,7 @@ from datetime import datetime
 
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import exists, func
 
 from .models import (
     db,
@@ -17,6 +17,7 @@ from .models import (
     SubtopicAssignment,
     TopicAssignment,
     DeregistrationRequest,
+    course_instructors,
 )
 
 instructor = Blueprint('instructor', __name__, url_prefix='/instructor')
@@ -36,7 +37,12 @@ def instructor_required(f):
 
 
 def _is_assigned(course_id: int) -> bool:
-    return any(c.course_id == course_id for c in getattr(current_user, "courses", []))
+    return db.session.query(
+        exists().where(
+            course_instructors.c.course_id == course_id,
+            course_instructors.c.instructor_id == current_user.user_id,
+        )
+    ).scalar()
 
 
 @instructor.route('/dashboard')
@@ -58,15 +64,10 @@ def course_detail(course_id):
         flash("You are not assigned to this course.")
         return redirect(url_for('instructor.dashboard'))
 
+    # The module outline is loaded by the template, only when its cached
+    # fragment is missing (see fragment_cache.outline_modules).
     course = Course.query.get_or_404(course_id)
 
-    modules = (
-        CourseModule.query
-        .filter_by(course_id=course_id)
-        .order_by(CourseModule.module_order.asc(), CourseModule.module_id.asc())
-        .all()
-    )
-
     enrollments = (
         Enrollment.query
         .filter_by(course_id=course_id)
@@ -88,7 +89,6 @@ def course_detail(course_id):
     return render_template(
         'instructor/course_detail.html',
         course=course,
-        modules=modules,
         enrollments=enrollments,
         dereg_student_ids=dereg_student_ids,
         tab=tab
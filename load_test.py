@@ -0,0 +1,141 @@
+"""
+Concurrency load test for seat allocation.
+
+`enrollment_race` seeds a scratch database with one course of `capacity`
+seats and `enrollers` students. It then starts one thread per student,
+releases them all at once through a barrier, and has each one call
+enroll_courses for that course and commit. Afterwards it checks:
+
+  - enrolled students == min(capacity, enrollers) (no overbooking),
+  - courses.seats_taken == the number of enrollment rows,
+  - every other student is on the waitlist,
+  - no enroller failed.
+
+The threads share a pool of `connections` connections, the way a pool of
+web workers would. With SQLite, writers queue on the database lock, so
+point --database-url at Postgres to exercise the row-level locking.
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import delete, func, select, update
+
+from .bench import _percentile
+from .enrollments import ENROLLED, WAITLISTED, enroll_courses
+from .models import db, Course, CourseWaitlist, DeregistrationRequest, Enrollment, Student
+from .schema import create_schema, drop_schema
+from .seed import seed_database
+from .summaries import refresh_student_summaries
+
+
+def _race_app(create_app, database_url, connections):
+    options = {"pool_size": connections, "max_overflow": 0, "pool_timeout": 120}
+    if database_url.startswith("sqlite"):
+        options["connect_args"] = {"timeout": 120, "check_same_thread": False}
+    return create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SQLALCHEMY_ENGINE_OPTIONS": options,
+        "SLOW_QUERY_THRESHOLD_MS": None,
+        "PROFILE_SAMPLE_RATE": 0.0,
+    })
+
+
+def enrollment_race(create_app, database_url=None, enrollers=500, capacity=50, connections=50):
+    """Race `enrollers` students for `capacity` seats; returns a report dict."""
+    scratch = None
+    if database_url is None:
+        fd, scratch = tempfile.mkstemp(suffix=".db", prefix="enrollment_race_")
+        os.close(fd)
+        database_url = f"sqlite:///{scratch}"
+
+    app = _race_app(create_app, database_url, connections)
+    try:
+        with app.app_context():
+            drop_schema()
+            create_schema()
+            seed_database(
+                universities=1, courses=1, instructors=0, students=enrollers,
+                enrollments_per_student=1.0, dereg_fraction=0.0,
+            )
+            # Start from an empty course with a hard seat limit.
+            db.session.execute(delete(DeregistrationRequest))
+            db.session.execute(delete(Enrollment))
+            db.session.execute(update(Course).values(capacity=capacity, seats_taken=0))
+            refresh_student_summaries(db.session)
+            db.session.commit()
+            course_id = db.session.scalar(select(Course.course_id))
+            student_ids = list(db.session.scalars(select(Student.user_id).order_by(Student.user_id)))
+
+        barrier = threading.Barrier(len(student_ids))
+        results = Counter()
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+
+        def enroller(student_id):
+            with app.app_context():
+                barrier.wait()
+                started = time.perf_counter()
+                try:
+                    result = enroll_courses(student_id, [course_id])[course_id]
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(f"{student_id}: {e}")
+                    return
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    results[result] += 1
+                    latencies.append(elapsed)
+
+        threads = [threading.Thread(target=enroller, args=(sid,)) for sid in student_ids]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            enrolled = db.session.scalar(
+                select(func.count()).select_from(Enrollment).where(Enrollment.course_id == course_id)
+            )
+            waitlisted = db.session.scalar(
+                select(func.count()).select_from(CourseWaitlist).where(CourseWaitlist.course_id == course_id)
+            )
+            seats_taken = db.session.scalar(select(Course.seats_taken).where(Course.course_id == course_id))
+            db.engine.dispose()
+    finally:
+        if scratch:
+            os.remove(scratch)
+
+    expected = min(capacity, len(student_ids))
+    problems = []
+    if enrolled != expected:
+        problems.append(f"{enrolled} enrolled, expected {expected}")
+    if seats_taken != enrolled:
+        problems.append(f"seats_taken is {seats_taken} but {enrolled} enrollments exist")
+    if enrolled + waitlisted != len(student_ids) - len(errors):
+        problems.append(f"{enrolled} enrolled + {waitlisted} waitlisted != {len(student_ids)} enrollers")
+    if results[ENROLLED] != enrolled or results[WAITLISTED] != waitlisted:
+        problems.append(f"results {dict(results)} disagree with the database")
+    if errors:
+        problems.append(f"{len(errors)} enroller(s) failed, e.g. {errors[0]}")
+
+    latencies.sort()
+    return {
+        "enrollers": len(student_ids),
+        "capacity": capacity,
+        "enrolled": enrolled,
+        "waitlisted": waitlisted,
+        "seats_taken": seats_taken,
+        "seconds": round(elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 50), 2) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99), 2) if latencies else None,
+        "problems": problems,
+    }
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics.
+
+Collected per request: duration (by endpoint, e.g. `student.course_detail`),
+database time, template render time, fragment cache hits/misses and render
+time, connection-pool checkout wait and the number of requests in flight.
+create_app's startup time is recorded per phase, and progress events by
+write-behind batch (see progress.py). They are exposed in Prometheus text
+format on /metrics.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a shared
+local directory (empty it on deploy) before the app is imported; each
+worker then writes its samples there and /metrics aggregates all of them.
+Call `mark_process_dead(pid)` from the server's worker-exit hook so live
+gauges of dead workers are dropped.
+"""
+
+import os
+import time
+
+from flask import Response, g, request, before_render_template, template_rendered
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .models import db
+
+
+REQUEST_LATENCY = Histogram(
+    "eduhub_request_duration_seconds",
+    "Request duration by endpoint.",
+    ["endpoint", "method", "status"],
+)
+REQUEST_DB_TIME = Histogram(
+    "eduhub_request_db_seconds",
+    "Time spent in SQL per request, by endpoint.",
+    ["endpoint"],
+)
+TEMPLATE_RENDER_TIME = Histogram(
+    "eduhub_template_render_seconds",
+    "Template render time by template.",
+    ["template"],
+)
+FRAGMENT_RENDER_TIME = Histogram(
+    "eduhub_fragment_render_seconds",
+    "Render time of cached template fragments on a cache miss.",
+    ["fragment"],
+)
+FRAGMENT_CACHE_REQUESTS = Counter(
+    "eduhub_fragment_cache_requests",
+    "Template fragment cache lookups by result (hit/miss).",
+    ["fragment", "result"],
+)
+PROGRESS_EVENTS = Counter(
+    "eduhub_progress_events",
+    "Learning-progress events accepted into the write-behind buffer.",
+)
+PROGRESS_FLUSH_SIZE = Histogram(
+    "eduhub_progress_flush_events",
+    "Progress events written per batch.",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+PROGRESS_FLUSH_TIME = Histogram(
+    "eduhub_progress_flush_seconds",
+    "Time to write one batch of progress events.",
+)
+PROGRESS_DROPPED = Counter(
+    "eduhub_progress_events_dropped",
+    "Progress events discarded after repeated failed writes.",
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "eduhub_db_pool_checkout_seconds",
+    "Time waiting to check a connection out of the pool.",
+    ["bind"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "eduhub_requests_in_flight",
+    "Requests currently being handled.",
+    multiprocess_mode="livesum",
+)
+STARTUP_TIME = Gauge(
+    "eduhub_startup_seconds",
+    "Time create_app spent in each startup phase.",
+    ["phase"],
+    multiprocess_mode="max",
+)
+
+
+def mark_process_dead(pid):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def observe_startup(timings):
+    for phase, seconds in timings.items():
+        STARTUP_TIME.labels(phase).set(seconds)
+
+
+def _time_pool_checkouts(bind, engine):
+    pool = engine.pool
+    if getattr(pool, "_eduhub_timed", False):
+        return
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT_WAIT.labels(bind or "default").observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+    pool._eduhub_timed = True
+
+
+def _endpoint():
+    # Unmatched URLs share one label so 404 scans can't blow up cardinality.
+    return request.endpoint or "unmatched"
+
+
+def metrics_view():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            _time_pool_checkouts(bind, engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def observe_request(exc):
+        start = g.pop("request_start", None)
+        if start is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+
+        endpoint = _endpoint()
+        REQUEST_LATENCY.labels(
+            endpoint, request.method, str(g.get("response_status", 500))
+        ).observe(time.perf_counter() - start)
+
+        stats = g.get("query_stats")
+        REQUEST_DB_TIME.labels(endpoint).observe(stats.total_time if stats else 0.0)
+
+    def _template_started(sender, template, context, **extra):
+        g.setdefault("template_starts", []).append(time.perf_counter())
+
+    def _template_finished(sender, template, context, **extra):
+        starts = g.get("template_starts")
+        if starts:
+            TEMPLATE_RENDER_TIME.labels(template.name or "<string>").observe(
+                time.perf_counter() - starts.pop()
+            )
+
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
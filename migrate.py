@@ -0,0 +1,191 @@
+"""
+Versioned schema migrations (Postgres).
+
+Migrations live in migrations/ as NNNN_description.sql and run in version
+order. Each applied step is recorded in the `schema_version` table with a
+SHA-256 checksum of its file, so a deploy only runs what is pending and
+refuses to continue if an already-applied file was edited afterwards.
+
+A file runs inside one transaction together with its schema_version row,
+unless its first line is
+
+    -- migrate: no-transaction
+
+in which case each `;`-terminated statement runs in autocommit mode. That
+is required for CREATE INDEX CONCURRENTLY, which builds the index without
+blocking writes. Keep such files to one simple statement per step and use
+IF NOT EXISTS: a step that fails part-way is not recorded and is retried on
+the next run (drop any INVALID index it left behind first).
+
+A session advisory lock keeps two deploys from migrating at the same time.
+"""
+
+import hashlib
+import os
+import re
+import time
+from collections import namedtuple
+
+from .models import db
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# Arbitrary key for pg_advisory_lock; any constant shared by all deploys.
+ADVISORY_LOCK_KEY = 4201038
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+Migration = namedtuple("Migration", "version name path checksum sql transactional")
+
+
+class MigrationError(Exception):
+    pass
+
+
+def discover(directory=None):
+    """All migrations in `directory`, ordered by version."""
+    directory = directory or MIGRATIONS_DIR
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version}: {filename}")
+
+        path = os.path.join(directory, filename)
+        with open(path, "r", encoding="utf-8") as f:
+            sql = f.read().replace("\r\n", "\n")
+        migrations[version] = Migration(
+            version=version,
+            name=match.group(2),
+            path=path,
+            checksum=hashlib.sha256(sql.encode("utf-8")).hexdigest(),
+            sql=sql,
+            transactional=not sql.lstrip().startswith(NO_TRANSACTION),
+        )
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _statements(sql):
+    """Split a no-transaction migration into its `;`-terminated statements."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.M) if s.strip()]
+
+
+def _ensure_version_table(cur):
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INT PRIMARY KEY,"
+        " name VARCHAR(255) NOT NULL,"
+        " checksum CHAR(64) NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        " execution_ms INT NOT NULL"
+        ")"
+    )
+
+
+def _applied(cur):
+    cur.execute("SELECT version, checksum FROM schema_version ORDER BY version")
+    return {version: checksum.strip() for version, checksum in cur.fetchall()}
+
+
+def _check(migrations, applied):
+    """Pending migrations; raises if an applied file changed or is missing."""
+    known = {m.version: m for m in migrations}
+    for version, checksum in applied.items():
+        m = known.get(version)
+        if m is None:
+            raise MigrationError(f"Migration {version} is applied but its file is missing")
+        if m.checksum != checksum:
+            raise MigrationError(
+                f"Migration {version} ({m.name}) was modified after it was applied; "
+                "add a new migration instead of editing an old one"
+            )
+    return [m for m in migrations if m.version not in applied]
+
+
+def migration_status(engine=None, directory=None):
+    """[(migration, applied?)] for every migration file."""
+    engine = engine or db.engine
+    migrations = discover(directory)
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        _ensure_version_table(cur)
+        conn.commit()
+        applied = _applied(cur)
+    finally:
+        conn.close()
+    _check(migrations, applied)
+    return [(m, m.version in applied) for m in migrations]
+
+
+def run_migrations(engine=None, directory=None, dry_run=False, echo=print):
+    """Apply every pending migration in order; returns the ones applied.
+
+    Like the old init-db this uses a raw DB-API connection so Postgres can
+    run whole scripts (multiple statements, DO $$ blocks, views).
+    """
+    engine = engine or db.engine
+    if engine.dialect.name != "postgresql":
+        raise MigrationError(
+            f"Migrations target Postgres; build {engine.dialect.name} databases with init-db"
+        )
+
+    migrations = discover(directory)
+    conn = engine.raw_connection()
+    driver = conn.driver_connection
+    done = []
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+        _ensure_version_table(cur)
+        conn.commit()
+
+        pending = _check(migrations, _applied(cur))
+        for m in pending:
+            if dry_run:
+                echo(f"pending  {m.version:04d} {m.name}")
+                continue
+
+            echo(f"applying {m.version:04d} {m.name}" + ("" if m.transactional else " (no transaction)"))
+            started = time.perf_counter()
+            if m.transactional:
+                try:
+                    cur.execute(m.sql)
+                except Exception:
+                    conn.rollback()
+                    raise
+            else:
+                # psycopg2 can't switch to autocommit inside a transaction,
+                # and the schema_version SELECT above may have opened one.
+                conn.commit()
+                driver.autocommit = True
+                try:
+                    for statement in _statements(m.sql):
+                        cur.execute(statement)
+                finally:
+                    driver.autocommit = False
+
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            cur.execute(
+                "INSERT INTO schema_version (version, name, checksum, execution_ms) "
+                "VALUES (%s, %s, %s, %s)",
+                (m.version, m.name, m.checksum, elapsed_ms),
+            )
+            conn.commit()
+            done.append(m)
+    finally:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+            conn.commit()
+        except Exception:
+            pass
+        conn.close()
+    return done
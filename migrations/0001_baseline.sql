@@ -1,4 +1,8 @@
 -- ==========================================================
+-- 0001 BASELINE: the former schema.sql.
+-- Runs once per database (tracked in schema_version); it is idempotent so
+-- it is also safe on databases that were set up with the old init-db.
+--
 -- SAFE / IDEMPOTENT SCHEMA (WON'T DROP DATA)
 -- - Creates types only if not exists
 -- - Creates tables only if not exists
@@ -0,0 +1,27 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0002 Foreign-key / filter indexes for the course outline and the
+-- deregistration workflow. Built CONCURRENTLY so writes keep flowing on
+-- large tables.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_coursemodules_course_id
+    ON coursemodules (course_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_moduletopics_module_id
+    ON moduletopics (module_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_topicsubtopics_topic_id
+    ON topicsubtopics (topic_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subtopicassignments_subtopic_id
+    ON subtopicassignments (subtopic_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_topicassignments_topic_id
+    ON topicassignments (topic_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subtopiccontents_subtopic_id
+    ON subtopiccontents (subtopic_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_deregistration_requests_course_status
+    ON deregistration_requests (course_id, status);
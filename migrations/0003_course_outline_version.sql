@@ -0,0 +1,8 @@
+-- ==========================================================
+-- 0003 Outline version per course, bumped by the app whenever the
+-- module/topic/subtopic outline changes; keys the template fragment cache.
+-- A constant default makes this a metadata-only change (no table rewrite).
+-- ==========================================================
+
+ALTER TABLE courses
+    ADD COLUMN IF NOT EXISTS outline_version INT NOT NULL DEFAULT 1;
@@ -0,0 +1,18 @@
+-- ==========================================================
+-- 0004 Version stamps for HTTP conditional GET (see http_cache.py):
+-- enrollments.updated_at plus a small counter table.
+-- ==========================================================
+
+ALTER TABLE enrollments
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO data_versions (name, version) VALUES
+    ('catalog', 0),
+    ('enrollment_deletes', 0)
+ON CONFLICT (name) DO NOTHING;
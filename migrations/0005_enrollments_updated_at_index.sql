@@ -0,0 +1,7 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0005 Index for max(enrollments.updated_at), built without blocking writes.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_enrollments_updated_at
+    ON enrollments (updated_at);
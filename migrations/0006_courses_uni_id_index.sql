@@ -0,0 +1,8 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0006 Catalog filters/facets and the university join look courses up by
+-- uni_id; build the FK index without blocking writes.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_courses_uni_id
+    ON courses (uni_id);
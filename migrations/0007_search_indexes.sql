@@ -0,0 +1,29 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0007 Full-text search (search.py): one GIN expression index per
+-- searchable text. The expressions must stay identical to the ones
+-- search.py matches with, or the planner will not use them.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_courses_name_fts
+    ON courses USING GIN (to_tsvector('english', course_name));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_coursemodules_title_fts
+    ON coursemodules USING GIN (to_tsvector('english', module_title));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_moduletopics_title_fts
+    ON moduletopics USING GIN (to_tsvector('english', topic_title));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_topicsubtopics_title_fts
+    ON topicsubtopics USING GIN (to_tsvector('english', subtopic_title));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subtopiccontents_title_fts
+    ON subtopiccontents USING GIN (to_tsvector('english', title));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subtopicassignments_fts
+    ON subtopicassignments USING GIN
+    (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_topicassignments_fts
+    ON topicassignments USING GIN
+    (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')));
@@ -0,0 +1,32 @@
+-- ==========================================================
+-- 0008 Per-student enrollment summaries (see summaries.py), backfilled
+-- from the current enrollments.
+-- ==========================================================
+
+CREATE TABLE IF NOT EXISTS student_summaries (
+    student_id INT PRIMARY KEY REFERENCES students(user_id) ON DELETE CASCADE,
+    enrolled_count INT NOT NULL DEFAULT 0,
+    graded_count INT NOT NULL DEFAULT 0,
+    marks_sum NUMERIC(12,2) NOT NULL DEFAULT 0,
+    gpa NUMERIC(5,2),
+    total_weeks INT NOT NULL DEFAULT 0,
+    next_due_date DATE,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+DELETE FROM student_summaries;
+
+INSERT INTO student_summaries
+    (student_id, enrolled_count, graded_count, marks_sum, gpa, total_weeks, next_due_date, updated_at)
+SELECT
+    e.student_id,
+    COUNT(*),
+    COUNT(e.marks),
+    COALESCE(SUM(e.marks), 0),
+    CASE WHEN COUNT(e.marks) > 0 THEN ROUND(SUM(e.marks) / COUNT(e.marks), 2) END,
+    COALESCE(SUM(c.duration_weeks), 0),
+    MIN(CASE WHEN e.marks IS NULL THEN e.due_by END),
+    CURRENT_TIMESTAMP
+FROM enrollments e
+JOIN courses c ON c.course_id = e.course_id
+GROUP BY e.student_id;
@@ -0,0 +1,23 @@
+-- ==========================================================
+-- 0009 Course capacity, the seat counter and waitlists (see enrollments.py).
+-- ==========================================================
+
+ALTER TABLE courses
+    ADD COLUMN IF NOT EXISTS capacity INT CHECK (capacity >= 0),
+    ADD COLUMN IF NOT EXISTS seats_taken INT NOT NULL DEFAULT 0;
+
+UPDATE courses c
+SET seats_taken = (SELECT COUNT(*) FROM enrollments e WHERE e.course_id = c.course_id);
+
+CREATE TABLE IF NOT EXISTS course_waitlist (
+    course_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    student_id INT NOT NULL REFERENCES students(user_id) ON DELETE CASCADE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (course_id, student_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_waitlist_course_created
+    ON course_waitlist (course_id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_course_waitlist_student_id
+    ON course_waitlist (student_id);
@@ -0,0 +1,23 @@
+-- ==========================================================
+-- 0010 Course prerequisites: direct edges plus their maintained
+-- transitive closure (see prerequisites.py).
+-- ==========================================================
+
+CREATE TABLE IF NOT EXISTS course_prerequisites (
+    course_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    prerequisite_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    PRIMARY KEY (course_id, prerequisite_id),
+    CHECK (course_id <> prerequisite_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_prerequisites_prerequisite_id
+    ON course_prerequisites (prerequisite_id);
+
+CREATE TABLE IF NOT EXISTS course_prerequisite_closure (
+    course_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    ancestor_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    PRIMARY KEY (course_id, ancestor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_prerequisite_closure_ancestor_id
+    ON course_prerequisite_closure (ancestor_id);
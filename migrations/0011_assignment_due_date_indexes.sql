@@ -0,0 +1,11 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0011 The student deadlines feed (deadlines.py) reaches assignments
+-- through their subtopic/topic and filters on due_date; index both.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subtopicassignments_subtopic_due
+    ON subtopicassignments (subtopic_id, due_date);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_topicassignments_topic_due
+    ON topicassignments (topic_id, due_date);
@@ -0,0 +1,33 @@
+-- ==========================================================
+-- 0012 Learning progress (see progress.py): per-content state written
+-- in batches, and its per-course rollup read by progress bars.
+-- ==========================================================
+
+CREATE TABLE IF NOT EXISTS content_progress (
+    student_id INT NOT NULL REFERENCES students(user_id) ON DELETE CASCADE,
+    content_id INT NOT NULL REFERENCES subtopiccontents(content_id) ON DELETE CASCADE,
+    course_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    viewed_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    position_seconds INT,
+    updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (student_id, content_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_content_progress_student_course
+    ON content_progress (student_id, course_id);
+
+CREATE INDEX IF NOT EXISTS idx_content_progress_content_id
+    ON content_progress (content_id);
+
+CREATE TABLE IF NOT EXISTS course_progress (
+    student_id INT NOT NULL REFERENCES students(user_id) ON DELETE CASCADE,
+    course_id INT NOT NULL REFERENCES courses(course_id) ON DELETE CASCADE,
+    viewed_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (student_id, course_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_progress_course_id
+    ON course_progress (course_id);
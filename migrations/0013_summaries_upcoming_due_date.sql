@@ -0,0 +1,13 @@
+-- ==========================================================
+-- 0013 student_summaries.next_due_date only counts due dates from today
+-- on (see summaries.py); rebuild it for the existing rows.
+-- ==========================================================
+
+UPDATE student_summaries s
+SET next_due_date = (
+    SELECT MIN(e.due_by)
+    FROM enrollments e
+    WHERE e.student_id = s.student_id
+      AND e.marks IS NULL
+      AND e.due_by >= CURRENT_DATE
+);
@@ -0,0 +1,6 @@
+-- ==========================================================
+-- 0014 Per-student secret signed into the calendar feed token (see
+-- deadlines.py); resetting it revokes the student's old feed links.
+-- ==========================================================
+
+ALTER TABLE students ADD COLUMN IF NOT EXISTS feed_secret VARCHAR(32);
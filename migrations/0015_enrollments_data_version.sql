@@ -0,0 +1,13 @@
+-- ==========================================================
+-- 0015 The unused 'enrollment_deletes' counter becomes the
+-- 'enrollments' version (inserts and deletes, see http_cache.py).
+-- ==========================================================
+
+UPDATE data_versions SET name = 'enrollments', version = version + 1, updated_at = CURRENT_TIMESTAMP
+WHERE name = 'enrollment_deletes'
+  AND NOT EXISTS (SELECT 1 FROM data_versions WHERE name = 'enrollments');
+
+DELETE FROM data_versions WHERE name = 'enrollment_deletes';
+
+INSERT INTO data_versions (name, version) VALUES ('enrollments', 0)
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- ==========================================================
+-- 0016 enrollments and course_instructors have composite PKs that lead
+-- with the other column, so lookups by course_id need their own index.
+-- Built CONCURRENTLY so writes keep flowing on large tables.
+-- ==========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_enrollments_course_id
+    ON enrollments (course_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_course_instructors_course_id
+    ON course_instructors (course_id);
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from sqlalchemy import Enum, func
@@ -56,6 +58,8 @@ class Student(User):
     age = db.Column(db.Integer)
     skill_level = db.Column(db.String(50))
     country = db.Column(db.String(100))
+    # Signed into the calendar feed token; resetting it revokes old links
+    feed_secret = db.Column(db.String(32))
     __mapper_args__ = {'polymorphic_identity': 'student'}
 
 
@@ -86,16 +90,26 @@ course_instructors = db.Table(
     'course_instructors',
     db.Column('course_id', db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True),
     db.Column('instructor_id', db.Integer, db.ForeignKey('instructors.user_id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_course_instructors_course_id', 'course_id'),
 )
 
 
 class Course(db.Model):
     __tablename__ = 'courses'
+    __table_args__ = (
+        db.Index('idx_courses_uni_id', 'uni_id'),
+    )
     course_id = db.Column(db.Integer, primary_key=True)
     course_name = db.Column(db.String(255), unique=True, nullable=False)
     duration_weeks = db.Column(db.Integer)
     c_type = db.Column(course_type_enum)
     uni_id = db.Column(db.Integer, db.ForeignKey('universities.uni_id', ondelete='CASCADE'), nullable=False)
+    # Bumped whenever the module/topic/subtopic outline changes (see fragment_cache.py)
+    outline_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Seat limit (None = unlimited); seats_taken is the row-level counter
+    # that seat allocation updates atomically (see enrollments.py)
+    capacity = db.Column(db.Integer)
+    seats_taken = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     enrollments = db.relationship('Enrollment', backref='course', lazy=True, cascade='all, delete-orphan')
 
@@ -116,6 +130,10 @@ class Topic(db.Model):
 
 class Enrollment(db.Model):
     __tablename__ = 'enrollments'
+    __table_args__ = (
+        db.Index('idx_enrollments_course_id', 'course_id'),
+        db.Index('idx_enrollments_updated_at', 'updated_at'),
+    )
     student_id = db.Column(db.Integer, db.ForeignKey('students.user_id', ondelete='CASCADE'), primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
 
@@ -124,6 +142,13 @@ class Enrollment(db.Model):
 
     marks = db.Column(db.Numeric(5, 2))
     letter_grade = db.Column(db.String(5))
+    # Set on every insert/update; drives conditional GET (see http_cache.py)
+    updated_at = db.Column(
+        db.TIMESTAMP,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        server_default=func.current_timestamp(),
+    )
 
     student = db.relationship('Student', backref=db.backref('enrollments', lazy=True))
 
@@ -166,6 +191,9 @@ class CourseOnlineBook(db.Model):
 
 class CourseModule(db.Model):
     __tablename__ = 'coursemodules'
+    __table_args__ = (
+        db.Index('idx_coursemodules_course_id', 'course_id'),
+    )
     module_id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), nullable=False)
     module_title = db.Column(db.String(255), nullable=False)
@@ -176,6 +204,9 @@ class CourseModule(db.Model):
 
 class ModuleTopic(db.Model):
     __tablename__ = 'moduletopics'
+    __table_args__ = (
+        db.Index('idx_moduletopics_module_id', 'module_id'),
+    )
     topic_id = db.Column(db.Integer, primary_key=True)
     module_id = db.Column(db.Integer, db.ForeignKey('coursemodules.module_id', ondelete='CASCADE'), nullable=False)
     topic_title = db.Column(db.String(255), nullable=False)
@@ -186,6 +217,9 @@ class ModuleTopic(db.Model):
 
 class TopicSubtopic(db.Model):
     __tablename__ = 'topicsubtopics'
+    __table_args__ = (
+        db.Index('idx_topicsubtopics_topic_id', 'topic_id'),
+    )
     subtopic_id = db.Column(db.Integer, primary_key=True)
     topic_id = db.Column(db.Integer, db.ForeignKey('moduletopics.topic_id', ondelete='CASCADE'), nullable=False)
     subtopic_title = db.Column(db.String(255), nullable=False)
@@ -197,6 +231,11 @@ class TopicSubtopic(db.Model):
 # Assignments attached to a specific subtopic
 class SubtopicAssignment(db.Model):
     __tablename__ = 'subtopicassignments'
+    __table_args__ = (
+        db.Index('idx_subtopicassignments_subtopic_id', 'subtopic_id'),
+        # Upcoming-deadline lookups per subtopic (see deadlines.py)
+        db.Index('idx_subtopicassignments_subtopic_due', 'subtopic_id', 'due_date'),
+    )
 
     assignment_id = db.Column(db.Integer, primary_key=True)
     subtopic_id = db.Column(db.Integer, db.ForeignKey('topicsubtopics.subtopic_id', ondelete='CASCADE'), nullable=False)
@@ -215,6 +254,10 @@ class SubtopicAssignment(db.Model):
 # Assignments attached to a specific topic
 class TopicAssignment(db.Model):
     __tablename__ = 'topicassignments'
+    __table_args__ = (
+        db.Index('idx_topicassignments_topic_id', 'topic_id'),
+        db.Index('idx_topicassignments_topic_due', 'topic_id', 'due_date'),
+    )
 
     assignment_id = db.Column(db.Integer, primary_key=True)
     topic_id = db.Column(db.Integer, db.ForeignKey('moduletopics.topic_id', ondelete='CASCADE'), nullable=False)
@@ -233,6 +276,9 @@ class TopicAssignment(db.Model):
 # ✅ UPDATED: Subtopic content now supports Video / Notes / Online Book
 class SubtopicContent(db.Model):
     __tablename__ = 'subtopiccontents'
+    __table_args__ = (
+        db.Index('idx_subtopiccontents_subtopic_id', 'subtopic_id'),
+    )
 
     content_id = db.Column(db.Integer, primary_key=True)
     subtopic_id = db.Column(db.Integer, db.ForeignKey('topicsubtopics.subtopic_id', ondelete='CASCADE'), nullable=False)
@@ -258,6 +304,9 @@ class SubtopicContent(db.Model):
 
 class DeregistrationRequest(db.Model):
     __tablename__ = 'deregistration_requests'
+    __table_args__ = (
+        db.Index('idx_deregistration_requests_course_status', 'course_id', 'status'),
+    )
 
     request_id = db.Column(db.Integer, primary_key=True)
 
@@ -273,4 +322,95 @@ class DeregistrationRequest(db.Model):
 
     student = db.relationship('Student', backref=db.backref('deregistration_requests', lazy=True))
     course = db.relationship('Course', backref=db.backref('deregistration_requests', lazy=True))
-    instructor = db.relationship('Instructor', backref=db.backref('deregistration_requests', lazy=True))
\ No newline at end of file
+    instructor = db.relationship('Instructor', backref=db.backref('deregistration_requests', lazy=True))
+
+
+# Direct prerequisite edges: course_id requires prerequisite_id
+class CoursePrerequisite(db.Model):
+    __tablename__ = 'course_prerequisites'
+    __table_args__ = (
+        db.Index('idx_course_prerequisites_prerequisite_id', 'prerequisite_id'),
+    )
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+    prerequisite_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+
+
+# Transitive closure of course_prerequisites, maintained by prerequisites.py
+class CoursePrerequisiteClosure(db.Model):
+    __tablename__ = 'course_prerequisite_closure'
+    __table_args__ = (
+        db.Index('idx_course_prerequisite_closure_ancestor_id', 'ancestor_id'),
+    )
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+
+
+# Students waiting for a seat in a full course, promoted first-come first-served
+class CourseWaitlist(db.Model):
+    __tablename__ = 'course_waitlist'
+    __table_args__ = (
+        db.Index('idx_course_waitlist_course_created', 'course_id', 'created_at'),
+        db.Index('idx_course_waitlist_student_id', 'student_id'),
+    )
+
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.user_id', ondelete='CASCADE'), primary_key=True)
+    created_at = db.Column(db.TIMESTAMP, nullable=False, default=datetime.utcnow, server_default=func.current_timestamp())
+
+
+# One counter per kind of change, bumped in the writing transaction (see http_cache.py)
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, server_default=func.current_timestamp())
+
+
+# Per-student rollup of enrollments, kept in step by summaries.py
+class StudentSummary(db.Model):
+    __tablename__ = 'student_summaries'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.user_id', ondelete='CASCADE'), primary_key=True)
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    marks_sum = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    gpa = db.Column(db.Numeric(5, 2))
+    total_weeks = db.Column(db.Integer, nullable=False, default=0)
+    # Earliest due_by, today or later, among ungraded enrollments
+    next_due_date = db.Column(db.Date)
+    updated_at = db.Column(db.TIMESTAMP, server_default=func.current_timestamp())
+
+
+# Per-student state of one content item, written in batches by progress.py
+class ContentProgress(db.Model):
+    __tablename__ = 'content_progress'
+    __table_args__ = (
+        db.Index('idx_content_progress_student_course', 'student_id', 'course_id'),
+        db.Index('idx_content_progress_content_id', 'content_id'),
+    )
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.user_id', ondelete='CASCADE'), primary_key=True)
+    content_id = db.Column(db.Integer, db.ForeignKey('subtopiccontents.content_id', ondelete='CASCADE'), primary_key=True)
+    # Denormalized from the outline so course rollups don't walk it
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), nullable=False)
+    viewed_at = db.Column(db.TIMESTAMP)
+    completed_at = db.Column(db.TIMESTAMP)
+    position_seconds = db.Column(db.Integer)  # for video
+    updated_at = db.Column(db.TIMESTAMP, nullable=False)
+
+
+# Per-student, per-course rollup of content_progress (see progress.py)
+class CourseProgress(db.Model):
+    __tablename__ = 'course_progress'
+    __table_args__ = (
+        db.Index('idx_course_progress_course_id', 'course_id'),
+    )
+
+    student_id = db.Column(db.Integer, db.ForeignKey('students.user_id', ondelete='CASCADE'), primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.course_id', ondelete='CASCADE'), primary_key=True)
+    viewed_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.TIMESTAMP, nullable=False)
@@ -0,0 +1,127 @@
+"""
+EXPLAIN-based index check.
+
+Drives every GET route of every blueprint once (the same routes and logins
+as bench.py), records the SELECTs each one issues, and EXPLAINs them. A
+statement fails the check when its plan reads a large table (at least
+`min_rows` rows; at the "small" seed scale 100 already covers users,
+enrollments and the course outline tables) with a full scan where an index
+could serve:
+
+  - Postgres: a Seq Scan node that also carries a Filter
+  - SQLite:   a "SCAN <table>" step that uses no index
+
+Pages that legitimately read whole tables (listings, full-table aggregates)
+are listed in ALLOWED_FULL_SCANS.
+"""
+
+import re
+
+from flask import has_request_context, request
+from sqlalchemy import event, func, select
+
+from .bench import bench_users, login_clients, route_urls
+from .models import db
+from .query_stats import fingerprint
+
+
+# (endpoint, table) pairs expected to read the whole table.
+ALLOWED_FULL_SCANS = {
+    ("admin.dashboard", "students"),              # total student count
+    ("admin.enrollments", "students"),            # lists every enrollment
+    ("analyst.student_performance", "students"),  # per-student averages over everyone
+}
+
+
+def _capture(app):
+    """{fingerprint: (endpoint, statement, parameters)} of every SELECT issued."""
+    captured = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not has_request_context():
+            return
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        captured.setdefault(fingerprint(statement), (request.endpoint, statement, parameters))
+
+    with app.app_context():
+        users = bench_users()
+        engine = db.engine
+    clients = login_clients(app, users)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for endpoint, role, url, skipped in route_urls(app, users):
+            if not skipped:
+                clients[role].get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def _postgres_scans(conn, statement, parameters):
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan" and "Filter" in node:
+            scans.append((node["Relation Name"], f"Seq Scan, Filter: {node['Filter']}"))
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return scans
+
+
+_FROM_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_NOT_ALIASES = {"ON", "WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "GROUP", "ORDER",
+                "LIMIT", "OFFSET", "HAVING", "UNION", "USING"}
+
+
+def _sqlite_scans(conn, statement, parameters):
+    # SQLite names the alias, not the table, in its plan.
+    aliases = {}
+    for table, alias in _FROM_ALIAS.findall(statement):
+        if alias and alias.upper() not in _NOT_ALIASES:
+            aliases[alias] = table
+
+    scans = []
+    for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+        detail = row[-1]
+        words = detail.split()
+        if words[:1] == ["SCAN"] and len(words) > 1 and "INDEX" not in words:
+            scans.append((aliases.get(words[1], words[1]), detail))
+    return scans
+
+
+def _table_rows():
+    return {
+        name: db.session.execute(select(func.count()).select_from(table)).scalar()
+        for name, table in db.metadata.tables.items()
+    }
+
+
+def check_plans(app, min_rows=100):
+    """(offending plans, number of distinct statements checked)."""
+    captured = _capture(app)
+    problems = []
+    with app.app_context():
+        rows = _table_rows()
+        with db.engine.connect() as conn:
+            # Fresh statistics, as autovacuum would have on a live server.
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+            explain = _postgres_scans if conn.dialect.name == "postgresql" else _sqlite_scans
+            for endpoint, statement, parameters in captured.values():
+                for table, detail in explain(conn, statement, parameters):
+                    if table not in rows or rows[table] < min_rows or (endpoint, table) in ALLOWED_FULL_SCANS:
+                        continue
+                    problems.append({
+                        "endpoint": endpoint,
+                        "table": table,
+                        "rows": rows[table],
+                        "detail": detail,
+                        "statement": " ".join(statement.split()),
+                    })
+    problems.sort(key=lambda p: (p["endpoint"], p["table"]))
+    return problems, len(captured)
@@ -0,0 +1,172 @@
+"""
+Course prerequisites.
+
+`course_prerequisites` holds the direct edges: course_id requires
+prerequisite_id. `course_prerequisite_closure` holds every transitive
+prerequisite of every course. A chain Advanced Algorithms -> Algorithms ->
+Discrete Math therefore gives Advanced Algorithms two closure rows.
+
+Eligibility never walks the graph. Enrolling, or drawing the explore page,
+is one indexed lookup of the course's closure rows against the student's
+passed enrollments (see missing_prerequisites_clause and
+prerequisite_status).
+
+Edits are where the graph work happens:
+  - add_prerequisite rejects an edge that would close a cycle. That is one
+    closure lookup: does the new prerequisite already require the course?
+  - a before_flush hook notes the courses whose closure may change, i.e.
+    the edited course and every course that requires it. An after_flush
+    hook rebuilds just their rows with a recursive CTE, in the same
+    transaction. Course deletes are handled the same way, because their
+    edges and closure rows go with them by cascade.
+"""
+
+from sqlalchemy import delete, event, exists, insert, literal, select
+
+from .models import db, Course, CoursePrerequisite, CoursePrerequisiteClosure, Enrollment
+
+
+# Marks needed for a course to count as completed (below 50 is an F).
+PASS_MARK = 50
+
+_edges = CoursePrerequisite.__table__
+_closure = CoursePrerequisiteClosure.__table__
+
+_PENDING = "prerequisite_closure_courses"
+
+
+class PrerequisiteError(ValueError):
+    """Raised for self-references, duplicates and cycles."""
+
+
+def _passed(student_id, course_id_column):
+    return exists().where(
+        Enrollment.student_id == student_id,
+        Enrollment.course_id == course_id_column,
+        Enrollment.marks >= PASS_MARK,
+    ).correlate_except(Enrollment)
+
+
+def missing_prerequisites_clause(student_id, course_id_column):
+    """True when the course in `course_id_column` has a prerequisite the student hasn't passed."""
+    return exists().where(
+        _closure.c.course_id == course_id_column,
+        ~_passed(student_id, _closure.c.ancestor_id),
+    ).correlate_except(_closure)
+
+
+def prerequisite_status(student_id, course_ids):
+    """{course_id: (met, missing names)} for the courses in `course_ids` that have prerequisites."""
+    if not course_ids:
+        return {}
+    rows = db.session.execute(
+        select(
+            _closure.c.course_id,
+            Course.course_name,
+            _passed(student_id, _closure.c.ancestor_id).label("passed"),
+        )
+        .join(Course, Course.course_id == _closure.c.ancestor_id)
+        .where(_closure.c.course_id.in_(course_ids))
+        .order_by(_closure.c.course_id, Course.course_name)
+    )
+    status = {}
+    for course_id, name, passed in rows:
+        missing = status.setdefault(course_id, [])
+        if not passed:
+            missing.append(name)
+    return {course_id: (not missing, missing) for course_id, missing in status.items()}
+
+
+def add_prerequisite(course_id, prerequisite_id):
+    """Make `course_id` require `prerequisite_id`; the caller commits."""
+    if course_id == prerequisite_id:
+        raise PrerequisiteError("A course cannot require itself.")
+    if db.session.get(CoursePrerequisite, (course_id, prerequisite_id)):
+        raise PrerequisiteError("That prerequisite is already set.")
+    cycle = db.session.scalar(
+        select(literal(True)).where(
+            _closure.c.course_id == prerequisite_id, _closure.c.ancestor_id == course_id
+        )
+    )
+    if cycle:
+        raise PrerequisiteError("That would create a cycle: the prerequisite already requires this course.")
+    db.session.add(CoursePrerequisite(course_id=course_id, prerequisite_id=prerequisite_id))
+
+
+def remove_prerequisite(course_id, prerequisite_id):
+    """Drop a direct prerequisite; True if it existed. The caller commits."""
+    edge = db.session.get(CoursePrerequisite, (course_id, prerequisite_id))
+    if edge is None:
+        return False
+    db.session.delete(edge)
+    return True
+
+
+def rebuild_closure(session, course_ids=None):
+    """Recompute the closure rows of `course_ids` (every course when None) from the edges."""
+    if course_ids is not None and not course_ids:
+        return
+
+    start = select(_edges.c.course_id, _edges.c.prerequisite_id.label("ancestor_id"))
+    clear = delete(_closure)
+    if course_ids is not None:
+        start = start.where(_edges.c.course_id.in_(course_ids))
+        clear = clear.where(_closure.c.course_id.in_(course_ids))
+
+    reach = start.cte("reach", recursive=True)
+    # UNION (not UNION ALL) also terminates if a cycle slipped in concurrently.
+    reach = reach.union(
+        select(reach.c.course_id, _edges.c.prerequisite_id)
+        .join(_edges, _edges.c.course_id == reach.c.ancestor_id)
+    )
+
+    session.execute(clear)
+    session.execute(
+        insert(_closure).from_select(
+            ["course_id", "ancestor_id"],
+            select(reach.c.course_id, reach.c.ancestor_id).where(reach.c.course_id != reach.c.ancestor_id),
+        )
+    )
+
+
+# --- closure maintenance ---
+
+def _note_changed_courses(session, flush_context, instances):
+    changed = {
+        obj.course_id
+        for obj in list(session.new) + list(session.deleted)
+        if isinstance(obj, CoursePrerequisite)
+    }
+    changed |= {obj.course_id for obj in session.deleted if isinstance(obj, Course)}
+    changed.discard(None)
+    if not changed:
+        return
+
+    # Everything that requires a changed course inherits the change.
+    with session.no_autoflush:
+        dependents = set(session.scalars(
+            select(_closure.c.course_id).where(_closure.c.ancestor_id.in_(changed))
+        ))
+    session.info.setdefault(_PENDING, set()).update(changed | dependents)
+
+
+def _rebuild_changed_courses(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        rebuild_closure(session, sorted(pending))
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING, None)
+
+
+_listeners_installed = False
+
+
+def init_prerequisites(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _note_changed_courses)
+        event.listen(db.session, "after_flush", _rebuild_changed_courses)
+        event.listen(db.session, "after_soft_rollback", _discard_pending)
+        _listeners_installed = True
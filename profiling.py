@@ -0,0 +1,118 @@
+"""
+On-demand request profiling.
+
+A request runs under cProfile when either
+  - it is picked by random sampling (PROFILE_SAMPLE_RATE, 0.0 - 1.0), or
+  - it carries an `X-Profile` header equal to PROFILE_TOKEN.
+
+Each profile is dumped as a pstats file under PROFILE_DIR/<endpoint>/,
+keeping at most PROFILE_KEEP_PER_ENDPOINT files per endpoint. The admin
+"Profiles" page aggregates them (see `top_functions`).
+"""
+
+import cProfile
+import glob
+import hmac
+import os
+import pstats
+import random
+import time
+
+from flask import current_app, g, request
+
+
+PROFILE_HEADER = "X-Profile"
+
+
+def profile_dir(app):
+    return app.config.get("PROFILE_DIR") or os.path.join(app.instance_path, "profiles")
+
+
+def _should_profile(app):
+    token = app.config.get("PROFILE_TOKEN")
+    header = request.headers.get(PROFILE_HEADER)
+    if token and header and hmac.compare_digest(header, token):
+        return True
+    rate = app.config.get("PROFILE_SAMPLE_RATE") or 0.0
+    return rate > 0 and random.random() < rate
+
+
+def _prune(directory, keep):
+    dumps = sorted(glob.glob(os.path.join(directory, "*.pstats")), key=os.path.getmtime)
+    for path in dumps[:-keep] if keep > 0 else dumps:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _dump(app, profiler, endpoint):
+    directory = os.path.join(profile_dir(app), endpoint)
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(1 << 16):04x}.pstats"
+    profiler.dump_stats(os.path.join(directory, name))
+    _prune(directory, app.config["PROFILE_KEEP_PER_ENDPOINT"])
+
+
+def init_profiling(app):
+    app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+    app.config.setdefault("PROFILE_TOKEN", None)
+    app.config.setdefault("PROFILE_KEEP_PER_ENDPOINT", 20)
+
+    @app.before_request
+    def start_profiler():
+        # Static files and unmatched URLs are not worth a profile.
+        if request.endpoint in (None, "static") or not _should_profile(current_app):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread.
+            return
+        g.profiler = profiler
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        profiler.disable()
+        try:
+            _dump(current_app, profiler, request.endpoint)
+        except OSError as e:
+            current_app.logger.warning("Could not write profile: %s", e)
+
+
+def profiled_endpoints(app):
+    """[(endpoint, number of dumps)] for every endpoint with profiles."""
+    root = profile_dir(app)
+    if not os.path.isdir(root):
+        return []
+    result = []
+    for endpoint in sorted(os.listdir(root)):
+        dumps = glob.glob(os.path.join(root, endpoint, "*.pstats"))
+        if dumps:
+            result.append((endpoint, len(dumps)))
+    return result
+
+
+def top_functions(app, endpoint, limit=30):
+    """Functions with the highest cumulative time across an endpoint's dumps."""
+    directory = os.path.join(profile_dir(app), endpoint)
+    dumps = glob.glob(os.path.join(directory, "*.pstats"))
+    if not dumps:
+        return []
+
+    stats = pstats.Stats(*dumps)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            "function": f"{func} ({os.path.basename(filename)}:{line})" if line else func,
+            "path": filename,
+            "calls": nc,
+            "tottime_ms": tt * 1000 / len(dumps),
+            "cumtime_ms": ct * 1000 / len(dumps),
+        })
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:limit]
@@ -0,0 +1,431 @@
+"""
+Learning progress.
+
+The course page reports progress events to POST /student/progress:
+"viewed" and "completed" for a content item, and "position" (seconds into
+a video). The state per student and content item lives in
+`content_progress`. `course_progress` rolls it up per student and course,
+and progress bars read that rollup.
+
+Events are not written by the request that receives them. They go into
+this process's ProgressBuffer, and a background thread writes the buffer
+out when PROGRESS_FLUSH_MAX_EVENTS events have queued up, or
+PROGRESS_FLUSH_INTERVAL_MS after the first one. Each flush is one
+transaction:
+  - events for the same student and content item are merged first;
+  - one query maps the content items to their courses, and one keeps only
+    the students enrolled in those courses;
+  - one multi-row INSERT ... ON CONFLICT DO UPDATE per 500 rows. This keeps
+    the first viewed/completed time and the latest video position;
+  - the touched course_progress rows are re-aggregated from
+    content_progress and upserted (like summaries.py, so a rollup can't
+    drift and concurrent flushes for the same pair don't collide).
+A burst of events therefore costs a few statements and one commit.
+
+The buffer is per process and in memory. Events still buffered when a
+worker is killed are lost; the default interval bounds that at half a
+second of progress. Workers flush at exit. A batch that fails to write
+goes back to the front of the buffer and is retried with the next flush;
+only after PROGRESS_FLUSH_ATTEMPTS failures in a row is it logged and
+dropped. A PROGRESS_FLUSH_INTERVAL_MS of 0 writes every request's events
+synchronously (used in testing).
+
+Deleting content cascades its content_progress rows in the database. A
+flush hook re-aggregates the rollups of the students who had progress on
+it.
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, event, exists, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .metrics import PROGRESS_DROPPED, PROGRESS_EVENTS, PROGRESS_FLUSH_SIZE, PROGRESS_FLUSH_TIME
+from .models import (
+    db,
+    ContentProgress,
+    CourseModule,
+    CourseProgress,
+    Enrollment,
+    ModuleTopic,
+    SubtopicContent,
+    TopicSubtopic,
+)
+
+
+EVENT_TYPES = ("viewed", "completed", "position")
+MAX_EVENTS_PER_REQUEST = 100
+UPSERT_CHUNK = 500
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_content = ContentProgress.__table__
+_course = CourseProgress.__table__
+
+_PENDING = "course_progress_changes"
+
+_ROLLUP_COLUMNS = ["student_id", "course_id", "viewed_count", "completed_count", "updated_at"]
+
+
+def _insert(conn, table):
+    dialect = conn.dialect if hasattr(conn, "dialect") else conn.get_bind().dialect
+    return _INSERTS[dialect.name](table)
+
+
+class ProgressEventError(ValueError):
+    """Raised for malformed progress events."""
+
+
+def parse_events(student_id, payload):
+    """Validate a request payload into [(student_id, content_id, type, position, at)].
+
+    `payload` is one event or {"events": [...]}; each event is
+    {"content_id": int, "event": "viewed" | "completed" | "position",
+     "position_seconds": int (position events only)}.
+    Whether the student may see the content is checked at flush time.
+    """
+    if not isinstance(payload, dict):
+        raise ProgressEventError("Expected a JSON object.")
+    raw = payload.get("events", [payload])
+    if not isinstance(raw, list) or not raw:
+        raise ProgressEventError("No progress events given.")
+    if len(raw) > MAX_EVENTS_PER_REQUEST:
+        raise ProgressEventError(f"At most {MAX_EVENTS_PER_REQUEST} events per request.")
+
+    now = datetime.utcnow()
+    events = []
+    for item in raw:
+        if not isinstance(item, dict):
+            raise ProgressEventError("Each event must be an object.")
+        content_id, kind = item.get("content_id"), item.get("event")
+        if not isinstance(content_id, int) or isinstance(content_id, bool) or content_id <= 0:
+            raise ProgressEventError("content_id must be a positive integer.")
+        if kind not in EVENT_TYPES:
+            raise ProgressEventError(f"event must be one of {', '.join(EVENT_TYPES)}.")
+        position = None
+        if kind == "position":
+            position = item.get("position_seconds")
+            if isinstance(position, float):
+                position = int(position)
+            if not isinstance(position, int) or isinstance(position, bool) or position < 0:
+                raise ProgressEventError("position_seconds must be a non-negative number.")
+        events.append((student_id, content_id, kind, position, now))
+    return events
+
+
+# --- writing ---
+
+def _merge(events):
+    """{(student_id, content_id): row} with the earliest view/completion and latest position."""
+    rows = {}
+    for student_id, content_id, kind, position, at in events:
+        row = rows.setdefault((student_id, content_id), {
+            "student_id": student_id,
+            "content_id": content_id,
+            "viewed_at": at,
+            "completed_at": None,
+            "position_seconds": None,
+            "updated_at": at,
+            "_position_at": None,
+        })
+        row["viewed_at"] = min(row["viewed_at"], at)
+        row["updated_at"] = max(row["updated_at"], at)
+        if kind == "completed" and (row["completed_at"] is None or at < row["completed_at"]):
+            row["completed_at"] = at
+        if kind == "position" and (row["_position_at"] is None or at >= row["_position_at"]):
+            row["position_seconds"], row["_position_at"] = position, at
+    return rows
+
+
+def write_progress(session, events):
+    """Upsert `events` and refresh the affected rollups; returns rows written. The caller commits."""
+    rows = _merge(events)
+    if not rows:
+        return 0
+
+    course_of = dict(session.execute(
+        select(SubtopicContent.content_id, CourseModule.course_id)
+        .join(TopicSubtopic, TopicSubtopic.subtopic_id == SubtopicContent.subtopic_id)
+        .join(ModuleTopic, ModuleTopic.topic_id == TopicSubtopic.topic_id)
+        .join(CourseModule, CourseModule.module_id == ModuleTopic.module_id)
+        .where(SubtopicContent.content_id.in_({content_id for _, content_id in rows}))
+    ).all())
+    student_ids = {student_id for student_id, _ in rows}
+    enrolled = set(session.execute(
+        select(Enrollment.student_id, Enrollment.course_id).where(
+            Enrollment.student_id.in_(student_ids),
+            Enrollment.course_id.in_(set(course_of.values())),
+        )
+    ).all())
+
+    values = []
+    for (student_id, content_id), row in sorted(rows.items()):
+        course_id = course_of.get(content_id)
+        if (student_id, course_id) in enrolled:
+            row.pop("_position_at")
+            values.append(dict(row, course_id=course_id))
+    if not values:
+        return 0
+
+    upsert = _insert(session, _content)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=["student_id", "content_id"],
+        set_={
+            "viewed_at": func.coalesce(_content.c.viewed_at, upsert.excluded.viewed_at),
+            "completed_at": func.coalesce(_content.c.completed_at, upsert.excluded.completed_at),
+            "position_seconds": func.coalesce(upsert.excluded.position_seconds, _content.c.position_seconds),
+            "updated_at": upsert.excluded.updated_at,
+        },
+    )
+    for start in range(0, len(values), UPSERT_CHUNK):
+        session.execute(upsert.values(values[start:start + UPSERT_CHUNK]))
+
+    refresh_course_progress(
+        session,
+        sorted({v["student_id"] for v in values}),
+        sorted({v["course_id"] for v in values}),
+    )
+    return len(values)
+
+
+def refresh_course_progress(conn, student_ids=None, course_ids=None):
+    """Rebuild the course_progress rows of `student_ids` x `course_ids` (None means all)."""
+    if (student_ids is not None and not student_ids) or (course_ids is not None and not course_ids):
+        return
+
+    aggregate = (
+        select(
+            _content.c.student_id,
+            _content.c.course_id,
+            func.count(_content.c.viewed_at),
+            func.count(_content.c.completed_at),
+            func.current_timestamp(),
+        )
+        .group_by(_content.c.student_id, _content.c.course_id)
+    )
+    # Rollups whose content_progress rows are all gone (deleted content).
+    tracked = exists().where(
+        _content.c.student_id == _course.c.student_id, _content.c.course_id == _course.c.course_id
+    )
+    clear = delete(_course).where(~tracked)
+    # SQLite needs a WHERE to parse INSERT ... SELECT ... ON CONFLICT.
+    aggregate = aggregate.where(_content.c.student_id.isnot(None))
+    if student_ids is not None:
+        aggregate = aggregate.where(_content.c.student_id.in_(student_ids))
+        clear = clear.where(_course.c.student_id.in_(student_ids))
+    if course_ids is not None:
+        aggregate = aggregate.where(_content.c.course_id.in_(course_ids))
+        clear = clear.where(_course.c.course_id.in_(course_ids))
+
+    upsert = _insert(conn, _course).from_select(_ROLLUP_COLUMNS, aggregate)
+    conn.execute(upsert.on_conflict_do_update(
+        index_elements=["student_id", "course_id"],
+        set_={name: upsert.excluded[name] for name in _ROLLUP_COLUMNS[2:]},
+    ))
+    conn.execute(clear)
+
+
+class ProgressBuffer:
+    """Per-process write-behind buffer of progress events."""
+
+    def __init__(self, app, interval_ms=500, max_events=1000, attempts=3):
+        self.app = app
+        self.interval = (interval_ms or 0) / 1000
+        self.max_events = max_events
+        self.attempts = attempts
+        self._events = []
+        self._failures = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def add(self, events):
+        PROGRESS_EVENTS.inc(len(events))
+        if not self.interval:
+            self._write(events)
+            return
+
+        with self._cond:
+            was_empty = not self._events
+            self._events.extend(events)
+            backlog = len(self._events)
+            self._ensure_thread()
+            if was_empty or backlog >= self.max_events:
+                self._cond.notify()
+        # The writer is falling behind; make producers help.
+        if backlog >= self.max_events * 10:
+            self.flush()
+
+    def flush(self):
+        """Write out everything buffered so far."""
+        with self._cond:
+            events, self._events = self._events, []
+        if not events:
+            return
+        try:
+            self._write(events)
+        except Exception:
+            self._requeue(events)
+            raise
+        with self._cond:
+            self._failures = 0
+
+    def _requeue(self, events):
+        """Put a failed batch back in front of newer events, unless it keeps failing."""
+        with self._cond:
+            self._failures += 1
+            if self._failures < self.attempts:
+                self._events[:0] = events
+                return
+            self._failures = 0
+        PROGRESS_DROPPED.inc(len(events))
+        self.app.logger.error("Dropped %d progress events after %d failed writes", len(events), self.attempts)
+
+    def _ensure_thread(self):
+        # Started lazily, and again in forked workers (threads don't survive a fork).
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._events:
+                    self._cond.wait()
+                deadline = time.monotonic() + self.interval
+                while len(self._events) < self.max_events:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Could not write progress events")
+
+    def _write(self, events):
+        started = time.perf_counter()
+        with self._write_lock, self.app.app_context():
+            try:
+                write_progress(db.session, events)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        PROGRESS_FLUSH_SIZE.observe(len(events))
+        PROGRESS_FLUSH_TIME.observe(time.perf_counter() - started)
+
+
+def record_progress(events):
+    """Hand events to this process's buffer."""
+    current_app.extensions["progress_buffer"].add(events)
+
+
+# --- reading ---
+
+def course_progress(student_id, course_ids):
+    """{course_id: percent of the course's content completed} for `course_ids`."""
+    if not course_ids:
+        return {}
+    totals = dict(db.session.execute(
+        select(CourseModule.course_id, func.count(SubtopicContent.content_id))
+        .join(ModuleTopic, ModuleTopic.module_id == CourseModule.module_id)
+        .join(TopicSubtopic, TopicSubtopic.topic_id == ModuleTopic.topic_id)
+        .join(SubtopicContent, SubtopicContent.subtopic_id == TopicSubtopic.subtopic_id)
+        .where(CourseModule.course_id.in_(course_ids))
+        .group_by(CourseModule.course_id)
+    ).all())
+    completed = dict(db.session.execute(
+        select(_course.c.course_id, _course.c.completed_count).where(
+            _course.c.student_id == student_id, _course.c.course_id.in_(course_ids)
+        )
+    ).all())
+    return {
+        course_id: min(100, round(100 * completed.get(course_id, 0) / totals[course_id])) if totals.get(course_id) else 0
+        for course_id in course_ids
+    }
+
+
+def content_states(student_id, course_id):
+    """{content_id: {"viewed", "completed", "position_seconds"}} for one course."""
+    rows = db.session.execute(
+        select(_content.c.content_id, _content.c.completed_at, _content.c.position_seconds).where(
+            _content.c.student_id == student_id, _content.c.course_id == course_id
+        )
+    )
+    return {
+        content_id: {"viewed": True, "completed": completed_at is not None, "position_seconds": position}
+        for content_id, completed_at, position in rows
+    }
+
+
+def progress_stamp(student_id, course_id, sess=None):
+    """http_cache stamp for one student's progress in one course."""
+    row = (sess or db.session).execute(
+        select(_course.c.completed_count, _course.c.viewed_count, _course.c.updated_at).where(
+            _course.c.student_id == student_id, _course.c.course_id == course_id
+        )
+    ).first()
+    if row is None:
+        return None, None
+    # The counts catch flushes within the timestamp's resolution.
+    return tuple(row), row.updated_at
+
+
+# --- rollups for deleted content ---
+
+def _note_deleted_content(session, flush_context, instances):
+    content_ids = [obj.content_id for obj in session.deleted if isinstance(obj, SubtopicContent)]
+    if not content_ids:
+        return
+    with session.no_autoflush:
+        pairs = session.execute(
+            select(_content.c.student_id, _content.c.course_id).where(_content.c.content_id.in_(content_ids))
+        ).all()
+    session.info.setdefault(_PENDING, set()).update(pairs)
+
+
+def _refresh_changed_rollups(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        refresh_course_progress(
+            session,
+            sorted({student_id for student_id, _ in pending}),
+            sorted({course_id for _, course_id in pending}),
+        )
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING, None)
+
+
+_listeners_installed = False
+
+
+def init_progress(app):
+    global _listeners_installed
+    app.config.setdefault("PROGRESS_FLUSH_INTERVAL_MS", 500)
+    app.config.setdefault("PROGRESS_FLUSH_MAX_EVENTS", 1000)
+    app.config.setdefault("PROGRESS_FLUSH_ATTEMPTS", 3)
+
+    buffer = ProgressBuffer(
+        app,
+        interval_ms=app.config["PROGRESS_FLUSH_INTERVAL_MS"],
+        max_events=app.config["PROGRESS_FLUSH_MAX_EVENTS"],
+        attempts=app.config["PROGRESS_FLUSH_ATTEMPTS"],
+    )
+    app.extensions["progress_buffer"] = buffer
+    atexit.register(buffer.flush)
+
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _note_deleted_content)
+        event.listen(db.session, "after_flush", _refresh_changed_rollups)
+        event.listen(db.session, "after_soft_rollback", _discard_pending)
+        _listeners_installed = True
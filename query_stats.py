@@ -0,0 +1,124 @@
+"""
+Per-request SQL instrumentation.
+
+Every statement executed while handling a request is counted and timed, and
+its shape (the SQL with literals and IN-lists collapsed) is fingerprinted.
+When one shape runs more than QUERY_REPEAT_THRESHOLD times in a single
+request - the usual symptom of an N+1 lazy load - a warning is logged, or
+RepeatedQueryError is raised if QUERY_REPEAT_RAISE is set (it defaults to
+on under app.testing).
+
+Each response gets a Server-Timing header with the query count and total
+database time.
+"""
+
+import re
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RepeatedQueryError(RuntimeError):
+    """Raised in test mode when a statement shape repeats too often."""
+
+
+class RequestQueryStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self.reported = set()
+
+    def record(self, fingerprint, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.fingerprints[fingerprint] += 1
+        return self.fingerprints[fingerprint]
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\([^)]*\)s|%s|:\w+))*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """Statement shape: literals and expanded IN-lists collapsed."""
+    s = _STRING.sub("?", statement)
+    s = _NUMBER.sub("?", s)
+    s = _PARAM_LIST.sub("(...)", s)
+    return _SPACE.sub(" ", s).strip()
+
+
+def current_stats():
+    """Stats for the request being handled, or None outside a request."""
+    if not has_request_context():
+        return None
+    if "query_stats" not in g:
+        g.query_stats = RequestQueryStats()
+    return g.query_stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+
+    stats = current_stats()
+    if stats is None:
+        return
+
+    shape = fingerprint(statement)
+    runs = stats.record(shape, elapsed)
+
+    threshold = current_app.config["QUERY_REPEAT_THRESHOLD"]
+    if runs > threshold and shape not in stats.reported:
+        stats.reported.add(shape)
+        message = (
+            f"Statement ran {runs} times in {request.endpoint}: {shape[:300]}"
+        )
+        raise_on_repeat = current_app.config["QUERY_REPEAT_RAISE"]
+        if raise_on_repeat is None:
+            raise_on_repeat = current_app.testing
+        if raise_on_repeat:
+            raise RepeatedQueryError(message)
+        current_app.logger.warning("Possible N+1 query. %s", message)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute.
+    conn = exception_context.connection
+    starts = conn.info.get("query_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+_listeners_installed = False
+
+
+def init_query_stats(app):
+    global _listeners_installed
+
+    app.config.setdefault("QUERY_REPEAT_THRESHOLD", 10)
+    app.config.setdefault("QUERY_REPEAT_RAISE", None)  # None: follow app.testing
+
+    if not _listeners_installed:
+        # Registered on the Engine class so the reporting bind is covered too.
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _listeners_installed = True
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get("query_stats") or RequestQueryStats()
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries"',
+        )
+        return response
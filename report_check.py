@@ -0,0 +1,61 @@
+"""
+Regression check for the analyst aggregates.
+
+`check_instructor_stats` recomputes the instructor performance report
+(analyst.instructor_stats) the slow, obvious way: it walks every
+instructor's courses and each course's enrollments through the ORM
+relationships, then compares courses, students and avg_marks per
+instructor. Instructors without courses must still appear, with zero
+courses, zero students and no average.
+
+`flask check-reports` runs it on a freshly seeded scratch database.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy.orm import selectinload
+
+from .analyst import instructor_stats
+from .models import db, Course, Instructor
+
+
+def _round2(value):
+    return None if value is None else Decimal(str(value)).quantize(Decimal("0.01"), ROUND_HALF_UP)
+
+
+def brute_force_instructor_stats(session):
+    """{user_id: (courses, students, avg_marks)} from the ORM relationships."""
+    expected = {}
+    instructors = session.query(Instructor).options(
+        selectinload(Instructor.courses).selectinload(Course.enrollments)
+    )
+    for instructor in instructors:
+        students = 0
+        marks = []
+        for course in instructor.courses:
+            students += len(course.enrollments)
+            marks += [e.marks for e in course.enrollments if e.marks is not None]
+        avg = _round2(sum(Decimal(str(m)) for m in marks) / len(marks)) if marks else None
+        expected[instructor.user_id] = (len(instructor.courses), students, avg)
+    return expected
+
+
+def check_instructor_stats(session=None):
+    """[problem] where instructor_stats disagrees with the brute-force counts."""
+    session = session or db.session
+    expected = brute_force_instructor_stats(session)
+    problems = []
+    seen = set()
+    for row in instructor_stats(session):
+        seen.add(row.user_id)
+        want = expected.get(row.user_id)
+        got = (row.courses, row.students, _round2(row.avg_marks))
+        if want is None:
+            problems.append(f"instructor {row.user_id}: reported but does not exist")
+        elif got != want:
+            problems.append(
+                f"instructor {row.user_id}: (courses, students, avg_marks) {got}, expected {want}"
+            )
+    for user_id in sorted(expected.keys() - seen):
+        problems.append(f"instructor {user_id}: missing from the report")
+    return problems, len(expected)
@@ -0,0 +1,95 @@
+"""
+Reporting database routing.
+
+Analyst pages and export jobs read through `reporting_session`, which is
+bound to the "reporting" engine (SQLALCHEMY_BINDS["reporting"]) when one is
+configured, so long aggregates use their own connection pool instead of the
+one serving enrollments and grading.
+
+When no reporting bind is configured, or the replica is lagging further
+behind than REPORTING_MAX_LAG_SECONDS, the session falls back to the
+primary engine.
+"""
+
+import time
+
+from flask import current_app, g
+from flask_sqlalchemy.query import Query
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from werkzeug.local import LocalProxy
+
+from .models import db
+
+
+REPORTING_BIND = "reporting"
+
+# Replica lag is re-checked at most this often (seconds) per engine.
+LAG_CHECK_INTERVAL = 5.0
+
+_lag_cache = {}
+
+
+def _replica_lag(engine):
+    """Seconds the replica is behind the primary (0 for non-replicas)."""
+    if engine.dialect.name != "postgresql":
+        return 0.0
+
+    now = time.monotonic()
+    cached = _lag_cache.get(engine)
+    if cached is not None and now - cached[0] < LAG_CHECK_INTERVAL:
+        return cached[1]
+
+    try:
+        with engine.connect() as conn:
+            # A replica that has replayed everything it received is current,
+            # however old its last transaction is (a quiet primary writes
+            # nothing to replay); only time replay that is actually behind.
+            lag = conn.execute(text(
+                "SELECT CASE"
+                " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+                " END"
+            )).scalar()
+        # NULL means the server is not replaying WAL, i.e. not a replica.
+        lag = float(lag) if lag is not None else 0.0
+    except Exception:
+        lag = float("inf")
+
+    _lag_cache[engine] = (now, lag)
+    return lag
+
+
+def reporting_engine():
+    """Engine analyst/reporting reads should use right now."""
+    engine = db.engines.get(REPORTING_BIND)
+    if engine is None:
+        return db.engine
+
+    max_lag = current_app.config.get("REPORTING_MAX_LAG_SECONDS")
+    if max_lag is not None and _replica_lag(engine) > max_lag:
+        return db.engine
+    return engine
+
+
+def _get_reporting_session():
+    if "reporting_session" not in g:
+        g.reporting_session = Session(
+            bind=reporting_engine(),
+            query_cls=Query,
+            autoflush=False,
+        )
+    return g.reporting_session
+
+
+reporting_session = LocalProxy(_get_reporting_session)
+
+
+def init_reporting(app):
+    app.config.setdefault("REPORTING_MAX_LAG_SECONDS", 30)
+
+    @app.teardown_appcontext
+    def close_reporting_session(exc):
+        session = g.pop("reporting_session", None)
+        if session is not None:
+            session.close()
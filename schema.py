@@ -0,0 +1,130 @@
+"""
+Dialect-portable schema setup.
+
+The long-lived Postgres server database is managed by the versioned
+migrations in migrations/ (see migrate.py). Fresh databases - SQLite or a
+local throwaway Postgres - are built from the SQLAlchemy models instead:
+
+    create_schema()   tables, indexes and enum types from db.metadata,
+                      then the reporting views
+    drop_schema()     the reverse
+
+Postgres-only extras are applied only on Postgres; SQLite gets
+`PRAGMA foreign_keys=ON` on every connection so ON DELETE CASCADE behaves
+the same on both.
+"""
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from .models import db
+
+
+# (name, SELECT) - the VIEWS section of migrations/0001_baseline.sql, minus the legacy
+# enrollments.grade column the models no longer map.
+VIEWS = [
+    ("student_courses", """
+        SELECT
+            c.course_id,
+            c.course_name,
+            c.duration_weeks,
+            c.c_type,
+            u.uni_name AS university_name,
+            u.city AS university_city,
+            u.country AS university_country
+        FROM courses c
+        JOIN universities u ON c.uni_id = u.uni_id
+    """),
+    ("instructor_assigned_courses", """
+        SELECT
+            ci.instructor_id,
+            c.course_id,
+            c.course_name,
+            c.duration_weeks,
+            c.c_type,
+            u.uni_name AS university_name
+        FROM course_instructors ci
+        JOIN courses c ON ci.course_id = c.course_id
+        JOIN universities u ON c.uni_id = u.uni_id
+    """),
+    ("course_statistics", """
+        SELECT
+            c.course_id,
+            c.course_name,
+            COUNT(e.student_id) AS total_enrollments,
+            AVG(e.marks) AS average_grade
+        FROM courses c
+        LEFT JOIN enrollments e ON c.course_id = e.course_id
+        GROUP BY c.course_id, c.course_name
+    """),
+]
+
+# Constraints the baseline migration declares inline that the models leave to the app.
+POSTGRES_EXTRAS = [
+    "ALTER TABLE students ADD CONSTRAINT students_age_check CHECK (age > 0)",
+    "ALTER TABLE enrollments ADD CONSTRAINT enrollments_marks_check CHECK (marks >= 0 AND marks <= 100)",
+    # Full-text search indexes (see search.py and migrations/0007).
+    "CREATE INDEX IF NOT EXISTS idx_courses_name_fts"
+    " ON courses USING GIN (to_tsvector('english', course_name))",
+    "CREATE INDEX IF NOT EXISTS idx_coursemodules_title_fts"
+    " ON coursemodules USING GIN (to_tsvector('english', module_title))",
+    "CREATE INDEX IF NOT EXISTS idx_moduletopics_title_fts"
+    " ON moduletopics USING GIN (to_tsvector('english', topic_title))",
+    "CREATE INDEX IF NOT EXISTS idx_topicsubtopics_title_fts"
+    " ON topicsubtopics USING GIN (to_tsvector('english', subtopic_title))",
+    "CREATE INDEX IF NOT EXISTS idx_subtopiccontents_title_fts"
+    " ON subtopiccontents USING GIN (to_tsvector('english', title))",
+    "CREATE INDEX IF NOT EXISTS idx_subtopicassignments_fts ON subtopicassignments USING GIN"
+    " (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')))",
+    "CREATE INDEX IF NOT EXISTS idx_topicassignments_fts ON topicassignments USING GIN"
+    " (to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')))",
+]
+
+_listeners_installed = False
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # Only SQLite connections carry this module name.
+    if type(dbapi_connection).__module__.startswith("sqlite3"):
+        cur = dbapi_connection.cursor()
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.close()
+
+
+def init_schema(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, "connect", _sqlite_foreign_keys)
+        _listeners_installed = True
+
+
+def create_schema(engine=None):
+    """Create every table, index, view (and Postgres extra) that is missing."""
+    engine = engine or db.engine
+    db.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        for name, select in VIEWS:
+            if postgres:
+                conn.execute(text(f"CREATE OR REPLACE VIEW {name} AS {select}"))
+            else:
+                conn.execute(text(f"CREATE VIEW IF NOT EXISTS {name} AS {select}"))
+
+        if postgres:
+            for statement in POSTGRES_EXTRAS:
+                # Savepoint so an already-present constraint doesn't abort the rest.
+                with conn.begin_nested() as sp:
+                    try:
+                        conn.execute(text(statement))
+                    except Exception:
+                        sp.rollback()
+
+
+def drop_schema(engine=None):
+    """Drop the views and every model table."""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        for name, _ in reversed(VIEWS):
+            conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+    db.metadata.drop_all(engine)
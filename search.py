@@ -0,0 +1,187 @@
+"""
+Full-text search over courses and their outlines.
+
+Searches course names, module/topic/subtopic titles, content titles and
+assignment titles/descriptions. Each source is one branch of a UNION ALL;
+results are ranked (a per-kind weight times the text rank), highlighted and
+paginated.
+
+On Postgres every branch matches `to_tsvector('english', <text>) @@
+websearch_to_tsquery(...)` against a GIN expression index on that text
+(migration 0007 / schema.POSTGRES_EXTRAS), and only keeps its own top
+offset+limit rows, so the merge never sorts more than a few pages. Snippets
+come from ts_headline, computed only for the rows on the page.
+
+Other backends (SQLite for local runs) fall back to case-insensitive
+substring matching of every query word, ranked by weight alone.
+"""
+
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import and_, func, literal, literal_column, union_all
+
+from .models import (
+    db,
+    Course,
+    CourseModule,
+    ModuleTopic,
+    TopicSubtopic,
+    SubtopicContent,
+    SubtopicAssignment,
+    TopicAssignment,
+)
+
+
+RESULTS_PER_PAGE = 20
+MAX_QUERY_LENGTH = 200
+
+TS_CONFIG = literal_column("'english'")
+
+# Highlight delimiters; the text is HTML-escaped first, then these become <mark>.
+_START, _STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = f"StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10, MaxFragments=2"
+
+KIND_WEIGHTS = {
+    "course": 1.0,
+    "module": 0.8,
+    "topic": 0.7,
+    "subtopic": 0.6,
+    "content": 0.5,
+    "assignment": 0.4,
+}
+
+
+def _sources():
+    """(kind, object id, searchable text, joins up to the course)."""
+    module_to_course = [(Course, Course.course_id == CourseModule.course_id)]
+    topic_to_course = [(CourseModule, CourseModule.module_id == ModuleTopic.module_id)] + module_to_course
+    subtopic_to_course = [(ModuleTopic, ModuleTopic.topic_id == TopicSubtopic.topic_id)] + topic_to_course
+
+    def assignment_text(model):
+        # Must match the idx_*assignments_fts index expressions.
+        return func.coalesce(model.title, "") + " " + func.coalesce(model.description, "")
+
+    def below_subtopic(model):
+        return [(TopicSubtopic, TopicSubtopic.subtopic_id == model.subtopic_id)] + subtopic_to_course
+
+    return [
+        ("course", Course, Course.course_id, Course.course_name, []),
+        ("module", CourseModule, CourseModule.module_id, CourseModule.module_title, module_to_course),
+        ("topic", ModuleTopic, ModuleTopic.topic_id, ModuleTopic.topic_title, topic_to_course),
+        ("subtopic", TopicSubtopic, TopicSubtopic.subtopic_id, TopicSubtopic.subtopic_title, subtopic_to_course),
+        ("content", SubtopicContent, SubtopicContent.content_id, SubtopicContent.title,
+         below_subtopic(SubtopicContent)),
+        ("assignment", SubtopicAssignment, SubtopicAssignment.assignment_id,
+         assignment_text(SubtopicAssignment), below_subtopic(SubtopicAssignment)),
+        ("assignment", TopicAssignment, TopicAssignment.assignment_id,
+         assignment_text(TopicAssignment),
+         [(ModuleTopic, ModuleTopic.topic_id == TopicAssignment.topic_id)] + topic_to_course),
+    ]
+
+
+def _branch(kind, model, object_id, text, joins, match, rank, limit):
+    select = db.select(
+        literal(kind).label("kind"),
+        object_id.label("object_id"),
+        Course.course_id.label("course_id"),
+        Course.course_name.label("course_name"),
+        text.label("text"),
+        (rank * KIND_WEIGHTS[kind]).label("rank"),
+    ).select_from(model)
+    for target, onclause in joins:
+        select = select.join(target, onclause)
+    select = select.where(match)
+    if limit is not None:
+        select = select.order_by(literal_column("rank").desc()).limit(limit)
+    return select.subquery().select()
+
+
+def _words(query):
+    return [w for w in re.findall(r"\w+", query.lower()) if len(w) > 1]
+
+
+def _search_postgres(query, offset, limit):
+    tsquery = func.websearch_to_tsquery(TS_CONFIG, query)
+    branches = []
+    for kind, model, object_id, text, joins in _sources():
+        vector = func.to_tsvector(TS_CONFIG, text)
+        branches.append(_branch(
+            kind, model, object_id, text, joins,
+            match=vector.op("@@")(tsquery),
+            rank=func.ts_rank(vector, tsquery),
+            limit=offset + limit,
+        ))
+    hits = union_all(*branches).subquery()
+    page = (
+        db.select(hits)
+        .order_by(hits.c.rank.desc(), hits.c.kind, hits.c.object_id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    stmt = db.select(
+        page.c.kind, page.c.object_id, page.c.course_id, page.c.course_name, page.c.rank,
+        func.ts_headline(TS_CONFIG, page.c.text, tsquery, HEADLINE_OPTIONS).label("snippet"),
+    ).order_by(page.c.rank.desc(), page.c.kind, page.c.object_id)
+    return db.session.execute(stmt).all()
+
+
+def _highlight_words(text, words):
+    if not words:
+        return text
+    pattern = re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)), re.I)
+    return pattern.sub(lambda m: f"{_START}{m.group(0)}{_STOP}", text)
+
+
+def _search_fallback(query, offset, limit):
+    words = _words(query)
+    if not words:
+        return []
+    branches = []
+    for kind, model, object_id, text, joins in _sources():
+        match = and_(*(func.lower(text).contains(w, autoescape=True) for w in words))
+        branches.append(_branch(kind, model, object_id, text, joins, match=match, rank=literal(1.0), limit=None))
+    hits = union_all(*branches).subquery()
+    rows = db.session.execute(
+        db.select(hits)
+        .order_by(hits.c.rank.desc(), hits.c.text, hits.c.object_id)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+    return [
+        (r.kind, r.object_id, r.course_id, r.course_name, r.rank, _highlight_words(r.text, words))
+        for r in rows
+    ]
+
+
+def _render_snippet(snippet):
+    """Escape the matched text and turn the highlight delimiters into <mark>."""
+    html = str(escape(snippet or ""))
+    return Markup(html.replace(_START, "<mark>").replace(_STOP, "</mark>"))
+
+
+def search(query, page=1, per_page=RESULTS_PER_PAGE):
+    """(hits, has_next) for `query`; each hit is a dict ready for the template."""
+    query = (query or "").strip()[:MAX_QUERY_LENGTH]
+    if not query:
+        return [], False
+
+    offset = (max(page, 1) - 1) * per_page
+    if db.engine.dialect.name == "postgresql":
+        rows = _search_postgres(query, offset, per_page + 1)
+    else:
+        rows = _search_fallback(query, offset, per_page + 1)
+
+    hits = [
+        {
+            "kind": kind,
+            "object_id": object_id,
+            "course_id": course_id,
+            "course_name": course_name,
+            "rank": float(rank),
+            "snippet": _render_snippet(snippet),
+        }
+        for kind, object_id, course_id, course_name, rank, snippet in rows[:per_page]
+    ]
+    return hits, len(rows) > per_page
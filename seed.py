@@ -0,0 +1,387 @@
+"""
+Synthetic data generator for load testing.
+
+`seed_database` fills every table with production-shaped data:
+universities, instructors, students, courses (with instructors), deep
+module/topic/subtopic/content outlines, assignments, graded enrollments and
+deregistration requests. Student summaries are rebuilt once the
+enrollments are loaded.
+
+- Course popularity follows a Zipf distribution (`zipf_s`), so a few courses
+  get most enrollments.
+- Outline sizes are Pareto-distributed (`outline_alpha`; smaller = more skew).
+- The same `seed` always produces the same data.
+
+Rows are streamed table by table. On Postgres they are loaded with COPY;
+other databases get batched executemany inserts. Everything runs in one
+transaction.
+"""
+
+import io
+import itertools
+import random
+import time
+from bisect import bisect_left
+from datetime import date, timedelta
+
+from sqlalchemy import func, select, text, update
+from werkzeug.security import generate_password_hash
+
+from .models import (
+    db,
+    User,
+    Student,
+    Instructor,
+    University,
+    Course,
+    course_instructors,
+    Enrollment,
+    CourseModule,
+    ModuleTopic,
+    TopicSubtopic,
+    SubtopicContent,
+    SubtopicAssignment,
+    TopicAssignment,
+    DeregistrationRequest,
+)
+from .summaries import refresh_student_summaries
+
+
+SEED_PASSWORD = "password"
+
+COUNTRIES = ["India", "United States", "United Kingdom", "Germany", "Canada", "Japan", "Brazil", "Australia"]
+CITIES = ["Kharagpur", "Boston", "London", "Berlin", "Toronto", "Tokyo", "Sao Paulo", "Sydney"]
+SUBJECTS = [
+    "Algorithms", "Machine Learning", "Databases", "Operating Systems", "Networks",
+    "Compilers", "Linear Algebra", "Statistics", "Information Retrieval", "Cloud Computing",
+    "Discrete Mathematics", "Computer Vision", "Cryptography", "Distributed Systems",
+]
+LEVELS = ["Introduction to", "Foundations of", "Applied", "Advanced", "Topics in"]
+WORDS = [
+    "gradient", "descent", "graph", "tree", "index", "query", "kernel", "cache", "thread",
+    "matrix", "vector", "proof", "hash", "search", "sort", "network", "model", "loss",
+    "optimizer", "protocol", "scheduler", "memory", "parser", "lexer", "probability",
+]
+SKILL_LEVELS = ["Beginner", "Intermediate", "Advanced"]
+C_TYPES = ["degree", "diploma", "certificate"]
+CONTENT_TYPES = ["video", "notes", "book"]
+DEREG_STATUSES = ["pending", "approved", "rejected"]
+
+
+def letter_grade(marks):
+    if marks is None:
+        return None
+    for cutoff, letter in ((90, "A"), (80, "B"), (70, "C"), (60, "D"), (50, "E")):
+        if marks >= cutoff:
+            return letter
+    return "F"
+
+
+class _Loader:
+    """Streams rows into one table at a time, in batches."""
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.use_copy = conn.dialect.name == "postgresql"
+        self.counts = {}
+
+    @staticmethod
+    def _copy_value(v):
+        if v is None:
+            return "\\N"
+        s = str(v)
+        return s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+    def _copy(self, table, columns, rows):
+        buf = io.StringIO()
+        for row in rows:
+            buf.write("\t".join(self._copy_value(v) for v in row))
+            buf.write("\n")
+        sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN"
+        cursor = self.conn.connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                buf.seek(0)
+                cursor.copy_expert(sql, buf)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+        finally:
+            cursor.close()
+
+    def load(self, table, columns, rows):
+        """Insert an iterable of row tuples (in `columns` order)."""
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                break
+            if self.use_copy:
+                self._copy(table, columns, batch)
+            else:
+                self.conn.execute(table.insert(), [dict(zip(columns, r)) for r in batch])
+            total += len(batch)
+        self.counts[table.name] = self.counts.get(table.name, 0) + total
+        return total
+
+
+def _next_id(conn, column):
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _pareto_size(rng, alpha, low, high):
+    return max(low, min(high, int(low * rng.paretovariate(alpha))))
+
+
+def seed_database(
+    universities=10,
+    courses=200,
+    instructors=100,
+    students=5000,
+    enrollments_per_student=4.0,
+    zipf_s=1.1,
+    outline_alpha=1.5,
+    max_modules=12,
+    graded_fraction=0.7,
+    dereg_fraction=0.01,
+    seed=42,
+    batch_size=10000,
+):
+    """Generate a synthetic tenant and return per-table row counts plus timing."""
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(SEED_PASSWORD, method="pbkdf2:sha256")
+    today = date.today()
+    started = time.perf_counter()
+
+    with db.engine.begin() as conn:
+        loader = _Loader(conn, batch_size)
+
+        # ---- Universities ----
+        first_uni = _next_id(conn, University.uni_id)
+        uni_ids = list(range(first_uni, first_uni + universities))
+        loader.load(
+            University.__table__,
+            ["uni_id", "uni_name", "city", "country", "uni_type"],
+            (
+                (uid, f"Seed University {uid}", CITIES[uid % len(CITIES)],
+                 COUNTRIES[uid % len(COUNTRIES)], rng.choice(["Public", "Private"]))
+                for uid in uni_ids
+            ),
+        )
+
+        # ---- Users: instructors then students ----
+        first_user = _next_id(conn, User.user_id)
+        instructor_ids = list(range(first_user, first_user + instructors))
+        student_ids = list(range(first_user + instructors, first_user + instructors + students))
+
+        def user_rows():
+            for uid in instructor_ids:
+                yield (uid, f"seed_instructor_{uid}", f"seed_instructor_{uid}@example.com",
+                       password_hash, f"Instructor{uid}", "Seed", "instructor")
+            for uid in student_ids:
+                yield (uid, f"seed_student_{uid}", f"seed_student_{uid}@example.com",
+                       password_hash, f"Student{uid}", "Seed", "student")
+
+        loader.load(
+            User.__table__,
+            ["user_id", "username", "email", "password_hash", "first_name", "last_name", "role"],
+            user_rows(),
+        )
+        loader.load(
+            Instructor.__table__,
+            ["user_id", "phone_number", "bio"],
+            ((uid, f"+91-{rng.randrange(10**9, 10**10)}", "Synthetic instructor.") for uid in instructor_ids),
+        )
+        loader.load(
+            Student.__table__,
+            ["user_id", "age", "skill_level", "country"],
+            ((uid, rng.randint(17, 45), rng.choice(SKILL_LEVELS), rng.choice(COUNTRIES)) for uid in student_ids),
+        )
+
+        # ---- Courses + instructors ----
+        first_course = _next_id(conn, Course.course_id)
+        course_ids = list(range(first_course, first_course + courses))
+        durations = {cid: rng.choice([4, 6, 8, 12, 16]) for cid in course_ids}
+        loader.load(
+            Course.__table__,
+            ["course_id", "course_name", "duration_weeks", "c_type", "uni_id"],
+            (
+                (cid, f"{rng.choice(LEVELS)} {rng.choice(SUBJECTS)} #{cid}", durations[cid],
+                 rng.choice(C_TYPES), rng.choice(uni_ids))
+                for cid in course_ids
+            ),
+        )
+
+        teachers = {}
+        if instructor_ids:
+            for cid in course_ids:
+                teachers[cid] = rng.sample(instructor_ids, min(len(instructor_ids), rng.choice([1, 1, 1, 2, 3])))
+        loader.load(
+            course_instructors,
+            ["course_id", "instructor_id"],
+            ((cid, iid) for cid, iids in teachers.items() for iid in iids),
+        )
+
+        # ---- Outline: modules -> topics -> subtopics -> contents/assignments ----
+        def words(n):
+            return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+        first_module = _next_id(conn, CourseModule.module_id)
+        module_ids = []
+
+        def module_rows():
+            mid = first_module
+            for cid in course_ids:
+                for order in range(1, _pareto_size(rng, outline_alpha, 2, max_modules) + 1):
+                    module_ids.append(mid)
+                    yield (mid, cid, f"Module {order}: {words(3)}", order)
+                    mid += 1
+
+        loader.load(CourseModule.__table__, ["module_id", "course_id", "module_title", "module_order"], module_rows())
+
+        first_topic = _next_id(conn, ModuleTopic.topic_id)
+        topic_ids = []
+
+        def topic_rows():
+            tid = first_topic
+            for mid in module_ids:
+                for order in range(1, _pareto_size(rng, outline_alpha, 1, 8) + 1):
+                    topic_ids.append(tid)
+                    yield (tid, mid, f"{words(3)}", order)
+                    tid += 1
+
+        loader.load(ModuleTopic.__table__, ["topic_id", "module_id", "topic_title", "topic_order"], topic_rows())
+
+        first_subtopic = _next_id(conn, TopicSubtopic.subtopic_id)
+        subtopic_ids = []
+
+        def subtopic_rows():
+            sid = first_subtopic
+            for tid in topic_ids:
+                for order in range(1, _pareto_size(rng, outline_alpha, 1, 6) + 1):
+                    subtopic_ids.append(sid)
+                    yield (sid, tid, f"{words(2)}", order)
+                    sid += 1
+
+        loader.load(TopicSubtopic.__table__, ["subtopic_id", "topic_id", "subtopic_title", "subtopic_order"], subtopic_rows())
+
+        def content_rows():
+            for sid in subtopic_ids:
+                for order in range(1, _pareto_size(rng, outline_alpha, 1, 5) + 1):
+                    ctype = rng.choice(CONTENT_TYPES)
+                    yield (
+                        sid, ctype, f"{words(4)}", f"https://example.com/content/{sid}/{order}",
+                        rng.randint(5, 90) if ctype == "video" else None,
+                        "PDF" if ctype == "notes" else None,
+                        order,
+                    )
+
+        loader.load(
+            SubtopicContent.__table__,
+            ["subtopic_id", "content_type", "title", "url", "duration_minutes", "file_format", "content_order"],
+            content_rows(),
+        )
+
+        def due(days_ahead):
+            return today + timedelta(days=days_ahead)
+
+        loader.load(
+            SubtopicAssignment.__table__,
+            ["subtopic_id", "title", "description", "due_date"],
+            (
+                (sid, f"Assignment: {words(2)}", f"Work through {words(6).lower()}.", due(rng.randint(-60, 120)))
+                for sid in subtopic_ids if rng.random() < 0.2
+            ),
+        )
+        loader.load(
+            TopicAssignment.__table__,
+            ["topic_id", "title", "description", "due_date"],
+            (
+                (tid, f"Project: {words(2)}", f"Build a {words(5).lower()}.", due(rng.randint(-60, 120)))
+                for tid in topic_ids if rng.random() < 0.1
+            ),
+        )
+
+        # ---- Enrollments (Zipfian course popularity) ----
+        popularity = [1.0 / (rank ** zipf_s) for rank in range(1, len(course_ids) + 1)]
+        ranked_courses = course_ids[:]
+        rng.shuffle(ranked_courses)
+        cum_weights = list(itertools.accumulate(popularity))
+        difficulty = {cid: rng.uniform(55, 85) for cid in course_ids}
+
+        enrolled_pairs = []
+
+        def enrollment_rows():
+            if not ranked_courses:
+                return
+            total_weight = cum_weights[-1]
+            for sid in student_ids:
+                k = min(len(ranked_courses), max(1, int(rng.expovariate(1.0 / enrollments_per_student)) + 1))
+                chosen = set()
+                for _ in range(k * 3):
+                    if len(chosen) >= k:
+                        break
+                    chosen.add(ranked_courses[bisect_left(cum_weights, rng.random() * total_weight)])
+                for cid in chosen:
+                    enrolled_on = today - timedelta(days=rng.randint(0, 730))
+                    marks = None
+                    if rng.random() < graded_fraction:
+                        marks = round(min(100.0, max(0.0, rng.gauss(difficulty[cid], 12))), 2)
+                    if rng.random() < dereg_fraction:
+                        enrolled_pairs.append((sid, cid))
+                    yield (
+                        sid, cid, enrolled_on, enrolled_on + timedelta(weeks=durations[cid]),
+                        marks, letter_grade(marks),
+                    )
+
+        loader.load(
+            Enrollment.__table__,
+            ["student_id", "course_id", "enrollment_date", "due_by", "marks", "letter_grade"],
+            enrollment_rows(),
+        )
+
+        # Bulk loads bypass the ORM hooks that keep summaries and seat counts current.
+        refresh_student_summaries(conn)
+        conn.execute(
+            update(Course)
+            .values(seats_taken=(
+                select(func.count())
+                .where(Enrollment.course_id == Course.course_id)
+                .scalar_subquery()
+            ))
+        )
+
+        loader.load(
+            DeregistrationRequest.__table__,
+            ["student_id", "course_id", "instructor_id", "reason", "status"],
+            (
+                (sid, cid, rng.choice(teachers[cid]), f"Synthetic request: {words(5).lower()}.",
+                 rng.choice(DEREG_STATUSES))
+                for sid, cid in enrolled_pairs if teachers.get(cid)
+            ),
+        )
+
+        # Explicit ids bypass the SERIAL sequences; move them past the new rows.
+        if conn.dialect.name == "postgresql":
+            for table, column in (
+                ("universities", "uni_id"), ("users", "user_id"), ("courses", "course_id"),
+                ("coursemodules", "module_id"), ("moduletopics", "topic_id"),
+                ("topicsubtopics", "subtopic_id"), ("subtopiccontents", "content_id"),
+                ("subtopicassignments", "assignment_id"), ("topicassignments", "assignment_id"),
+                ("deregistration_requests", "request_id"),
+            ):
+                conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"COALESCE((SELECT MAX({column}) FROM {table}), 1))"
+                ))
+
+    elapsed = time.perf_counter() - started
+    rows = sum(loader.counts.values())
+    return {
+        "tables": loader.counts,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": int(rows / elapsed) if elapsed > 0 else rows,
+    }
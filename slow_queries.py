@@ -0,0 +1,201 @@
+"""
+Slow-query recorder.
+
+Any statement slower than SLOW_QUERY_THRESHOLD_MS is appended to a rotating
+JSONL file (SLOW_QUERY_LOG) together with its redacted parameters, the
+endpoint that issued it and the planner's EXPLAIN output. Plans are captured
+at most once per statement shape per EXPLAIN_INTERVAL seconds per process.
+
+`flask slow-queries` summarizes the log by statement shape.
+"""
+
+import glob
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .query_stats import fingerprint
+
+
+EXPLAIN_INTERVAL = 60.0
+
+_logger = logging.getLogger("eduhub.slow_queries")
+_logger.propagate = False
+_last_explained = {}
+
+
+def slow_query_log_path(app):
+    return app.config.get("SLOW_QUERY_LOG") or os.path.join(
+        app.instance_path, "slow_queries.jsonl"
+    )
+
+
+def _redact(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (Decimal, date, datetime)):
+        return str(value)
+    if isinstance(value, str):
+        return f"<str:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters):
+    """Keep numbers, dates and NULLs; replace strings and blobs by their type."""
+    if isinstance(parameters, dict):
+        return {k: _redact(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(v) for v in parameters]
+    return _redact(parameters)
+
+
+def _explain(conn, cursor, statement, parameters):
+    """EXPLAIN the statement on the same DBAPI connection, without events."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE off) "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+
+    dbapi_conn = cursor.connection
+    explain_cursor = dbapi_conn.cursor()
+    try:
+        if dialect == "postgresql":
+            # A failed EXPLAIN must not abort the caller's transaction.
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            rows = explain_cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            return f"EXPLAIN failed: {e}"
+        if dialect == "postgresql":
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return "\n".join(" ".join(str(col) for col in row) for row in rows)
+    finally:
+        explain_cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+
+    if not has_app_context():
+        return
+    threshold = current_app.config.get("SLOW_QUERY_THRESHOLD_MS")
+    if threshold is None or elapsed_ms < threshold:
+        return
+
+    shape = fingerprint(statement)
+    plan = None
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    is_explainable = verb in ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+    now = time.monotonic()
+    if not executemany and is_explainable and now - _last_explained.get(shape, -EXPLAIN_INTERVAL) >= EXPLAIN_INTERVAL:
+        _last_explained[shape] = now
+        plan = _explain(conn, cursor, statement, parameters)
+
+    _logger.info(json.dumps({
+        "at": datetime.utcnow().isoformat(),
+        "duration_ms": round(elapsed_ms, 2),
+        "endpoint": request.endpoint if has_request_context() else None,
+        "fingerprint": shape,
+        "statement": statement,
+        "parameters": redact_parameters(parameters) if not executemany else "<executemany>",
+        "explain": plan,
+    }))
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    starts = conn.info.get("slow_query_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+
+_listeners_installed = False
+
+
+def init_slow_queries(app):
+    global _listeners_installed
+
+    app.config.setdefault("SLOW_QUERY_THRESHOLD_MS", 200)
+    app.config.setdefault("SLOW_QUERY_LOG_MAX_BYTES", 10 * 1024 * 1024)
+    app.config.setdefault("SLOW_QUERY_LOG_BACKUPS", 5)
+
+    if app.config["SLOW_QUERY_THRESHOLD_MS"] is None:
+        return
+
+    if not _logger.handlers:
+        path = slow_query_log_path(app)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=app.config["SLOW_QUERY_LOG_MAX_BYTES"],
+            backupCount=app.config["SLOW_QUERY_LOG_BACKUPS"],
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(handler)
+        _logger.setLevel(logging.INFO)
+
+    if not _listeners_installed:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _listeners_installed = True
+
+
+def summarize(path, limit=20):
+    """Aggregate the log (and its rotated files) by statement shape.
+
+    Returns the `limit` shapes with the highest total time, slowest first.
+    """
+    groups = defaultdict(lambda: {
+        "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+        "endpoints": defaultdict(int), "explain": None,
+    })
+
+    for log_file in sorted(glob.glob(path + "*")):
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                grp = groups[entry["fingerprint"]]
+                grp["count"] += 1
+                grp["total_ms"] += entry["duration_ms"]
+                grp["max_ms"] = max(grp["max_ms"], entry["duration_ms"])
+                grp["endpoints"][entry.get("endpoint") or "-"] += 1
+                if entry.get("explain"):
+                    grp["explain"] = entry["explain"]
+
+    ranked = sorted(groups.items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+    return [
+        {
+            "fingerprint": shape,
+            "count": grp["count"],
+            "total_ms": round(grp["total_ms"], 2),
+            "mean_ms": round(grp["total_ms"] / grp["count"], 2),
+            "max_ms": round(grp["max_ms"], 2),
+            "endpoints": dict(sorted(grp["endpoints"].items(), key=lambda kv: -kv[1])),
+            "explain": grp["explain"],
+        }
+        for shape, grp in ranked[:limit]
+    ]
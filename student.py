@@ -1,20 +1,75 @@
 import json
 import os
 from functools import wraps
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from flask import (
     Blueprint,
+    Response,
+    abort,
     render_template,
     redirect,
     url_for,
     flash,
     request,
+    jsonify,
 )
 from flask_login import login_required, current_user
 from sqlalchemy import func
 
-from .models import db, Student, Course, Enrollment, University
+from .catalog import catalog_facets, catalog_page, parse_filters
+from .deadlines import (
+    DASHBOARD_DEADLINES,
+    FEED_LIMIT,
+    FEED_PAST_DAYS,
+    cached_deadlines,
+    deadlines_stamp,
+    feed_token,
+    reset_feed_secret,
+    student_for_token,
+    to_ical,
+)
+from .enrollments import (
+    ALREADY_ENROLLED,
+    ENROLLED,
+    MAX_CART_COURSES,
+    MISSING_PREREQUISITES,
+    NOT_FOUND,
+    WAITLISTED,
+    enroll_courses,
+    leave_waitlist as leave_course_waitlist,
+    waitlist_positions,
+)
+from .http_cache import (
+    CATALOG,
+    conditional,
+    course_stamp,
+    data_version_stamp,
+    enrollments_stamp,
+    submissions_stamp,
+)
+from .models import (
+    db,
+    Student,
+    Course,
+    Enrollment,
+    University,
+    CourseModule,
+    ModuleTopic,
+    TopicSubtopic,
+    SubtopicAssignment,
+)
+from .prerequisites import prerequisite_status
+from .progress import (
+    ProgressEventError,
+    content_states,
+    course_progress,
+    parse_events,
+    progress_stamp,
+    record_progress,
+)
+from .search import search as search_outlines
+from .summaries import COURSES_PER_PAGE, student_summary
 
 
 student = Blueprint("student", __name__, url_prefix="/student")
@@ -46,21 +101,22 @@ def student_required(f):
 def dashboard():
     """Student dashboard showing enrolled courses and student info."""
 
-    # Get student's enrolled courses with course and university details
-    enrolled_courses = (
-        db.session.query(Course, Enrollment, University)
-        .join(Enrollment, Course.course_id == Enrollment.course_id)
-        .join(University, Course.uni_id == University.uni_id)
-        .filter(Enrollment.student_id == current_user.user_id)
-        .all()
-    )
+    summary = student_summary(current_user.user_id)
+    enrolled_courses = _enrolled_courses_page(summary)
 
     # Get student object for additional info
     student_info = Student.query.get(current_user.user_id)
 
     return render_template(
         "student/dashboard.html",
+        summary=summary,
         enrolled_courses=enrolled_courses,
+        waitlisted=waitlist_positions(current_user.user_id),
+        progress=course_progress(
+            current_user.user_id, [course.course_id for course, _, _ in enrolled_courses.items]
+        ),
+        deadlines=cached_deadlines(current_user.user_id, limit=DASHBOARD_DEADLINES),
+        feed_token=feed_token(student_info),
         student=student_info,
     )
 
@@ -71,57 +127,89 @@ def dashboard():
 def grades():
     """View all grades for enrolled courses."""
 
-    # Get enrollments with course details and grades
-    enrollments = (
+    summary = student_summary(current_user.user_id)
+
+    return render_template(
+        "student/grades.html",
+        summary=summary,
+        enrollments=_enrolled_courses_page(summary),
+        gpa=summary.gpa or 0,
+    )
+
+
+def _enrolled_courses_page(summary):
+    """One page of (course, enrollment, university); the total comes from the summary."""
+    pagination = (
         db.session.query(Course, Enrollment, University)
         .join(Enrollment, Course.course_id == Enrollment.course_id)
         .join(University, Course.uni_id == University.uni_id)
         .filter(Enrollment.student_id == current_user.user_id)
-        .all()
-    )
-
-    # Calculate GPA (assuming grades are out of 100)
-    total_grades = 0
-    count = 0
-    for course, enrollment, university in enrollments:
-        if enrollment.marks:
-            total_grades += float(enrollment.marks)
-            count += 1
-
-    gpa = round(total_grades / count, 2) if count > 0 else 0
-
-    return render_template(
-        "student/grades.html",
-        enrollments=enrollments,
-        gpa=gpa,
+        .order_by(Enrollment.enrollment_date.desc(), Course.course_id)
+        .paginate(
+            page=request.args.get("page", 1, type=int),
+            per_page=COURSES_PER_PAGE,
+            error_out=False,
+            count=False,
+        )
     )
+    pagination.total = summary.enrolled_count
+    return pagination
 
 
 @student.route("/explore-courses")
 @login_required
 @student_required
+@conditional(lambda: [
+    data_version_stamp(CATALOG),
+    enrollments_stamp(student_id=current_user.user_id),
+])
 def explore_courses():
-    """Browse all available courses and enroll."""
+    """Browse available courses (faceted, keyset-paginated) and enroll."""
 
-    # Get all courses with university details
-    all_courses = (
-        db.session.query(Course, University)
-        .join(University, Course.uni_id == University.uni_id)
-        .all()
+    filters = parse_filters(request.args)
+    after = request.args.get("after") or None
+    courses, next_cursor = catalog_page(filters, current_user.user_id, after=after)
+    prerequisites = prerequisite_status(
+        current_user.user_id, [course.course_id for course, _, enrolled in courses if not enrolled]
     )
 
-    # Get list of course IDs the student is already enrolled in
-    enrolled_course_ids = (
-        db.session.query(Enrollment.course_id)
-        .filter(Enrollment.student_id == current_user.user_id)
-        .all()
+    return render_template(
+        "student/explore_courses.html",
+        courses=courses,
+        prerequisites=prerequisites,
+        facets=catalog_facets(filters),
+        filters=filters,
+        after=after,
+        next_cursor=next_cursor,
     )
-    enrolled_course_ids = [cid[0] for cid in enrolled_course_ids]
+
+
+@student.route("/search")
+@login_required
+@student_required
+def search():
+    """Full-text search over courses and their outlines."""
+
+    q = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    hits, has_next = search_outlines(q, page=page)
+
+    course_ids = {hit["course_id"] for hit in hits}
+    enrolled_ids = {
+        course_id
+        for (course_id,) in db.session.query(Enrollment.course_id).filter(
+            Enrollment.student_id == current_user.user_id,
+            Enrollment.course_id.in_(course_ids),
+        )
+    } if course_ids else set()
 
     return render_template(
-        "student/explore_courses.html",
-        all_courses=all_courses,
-        enrolled_course_ids=enrolled_course_ids,
+        "student/search.html",
+        q=q,
+        page=page,
+        hits=hits,
+        has_next=has_next,
+        enrolled_ids=enrolled_ids,
     )
 
 
@@ -131,35 +219,83 @@ def explore_courses():
 def enroll(course_id):
     """Enroll in a course."""
 
-    # Check if course exists
-    course = Course.query.get(course_id)
-    if not course:
-        flash("Course not found.")
+    try:
+        result = enroll_courses(current_user.user_id, [course_id])[course_id]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error enrolling in course: {str(e)}")
         return redirect(url_for("student.explore_courses"))
 
-    # Check if already enrolled
-    existing_enrollment = Enrollment.query.filter_by(
-        student_id=current_user.user_id,
-        course_id=course_id,
-    ).first()
-
-    if existing_enrollment:
+    if result == NOT_FOUND:
+        flash("Course not found.")
+        return redirect(url_for("student.explore_courses"))
+    if result == ALREADY_ENROLLED:
         flash("You are already enrolled in this course.")
         return redirect(url_for("student.explore_courses"))
+    if result == MISSING_PREREQUISITES:
+        flash("You need to pass this course's prerequisites before enrolling.")
+        return redirect(url_for("student.explore_courses"))
+    if result == WAITLISTED:
+        flash("This course is full. You are on the waitlist and will be enrolled when a seat opens.")
+        return redirect(url_for("student.dashboard"))
 
-    # Create new enrollment
-    new_enrollment = Enrollment(
-        student_id=current_user.user_id,
-        course_id=course_id,
-    )
+    course = db.session.get(Course, course_id)
+    flash(f"Successfully enrolled in {course.course_name}!")
+    return redirect(url_for("student.dashboard"))
+
+
+@student.route("/cart/enroll", methods=["POST"])
+@login_required
+@student_required
+def enroll_cart():
+    """Enroll in every course in the cart at once (form or JSON `course_ids`)."""
+
+    if request.is_json:
+        course_ids = (request.get_json(silent=True) or {}).get("course_ids") or []
+        course_ids = [c for c in course_ids if isinstance(c, int)]
+    else:
+        course_ids = request.form.getlist("course_id", type=int)
+
+    if not course_ids or len(set(course_ids)) > MAX_CART_COURSES:
+        message = f"Select between 1 and {MAX_CART_COURSES} courses."
+        if request.is_json:
+            return jsonify({"error": message}), 400
+        flash(message)
+        return redirect(url_for("student.explore_courses"))
 
-    db.session.add(new_enrollment)
     try:
+        results = enroll_courses(current_user.user_id, course_ids)
         db.session.commit()
-        flash(f"Successfully enrolled in {course.course_name}!")
     except Exception as e:
         db.session.rollback()
-        flash(f"Error enrolling in course: {str(e)}")
+        if request.is_json:
+            return jsonify({"error": str(e)}), 500
+        flash(f"Error enrolling in courses: {str(e)}")
+        return redirect(url_for("student.explore_courses"))
+
+    if request.is_json:
+        return jsonify({"results": {str(course_id): result for course_id, result in results.items()}})
+
+    names = dict(
+        db.session.query(Course.course_id, Course.course_name).filter(Course.course_id.in_(results))
+    )
+    by_result = {}
+    for course_id, result in sorted(results.items()):
+        by_result.setdefault(result, []).append(names.get(course_id, f"#{course_id}"))
+    # The layout shows one flash message, so report every outcome in it.
+    parts = []
+    if ENROLLED in by_result:
+        parts.append(f"Successfully enrolled in {', '.join(by_result[ENROLLED])}!")
+    if WAITLISTED in by_result:
+        parts.append(f"Waitlisted for {', '.join(by_result[WAITLISTED])} (full).")
+    if MISSING_PREREQUISITES in by_result:
+        parts.append(f"Prerequisites not met for {', '.join(by_result[MISSING_PREREQUISITES])}.")
+    if ALREADY_ENROLLED in by_result:
+        parts.append(f"Already enrolled in {', '.join(by_result[ALREADY_ENROLLED])}.")
+    if NOT_FOUND in by_result:
+        parts.append(f"Courses not found: {', '.join(by_result[NOT_FOUND])}.")
+    flash(" ".join(parts))
 
     return redirect(url_for("student.dashboard"))
 
@@ -190,9 +326,77 @@ def unenroll(course_id):
     return redirect(url_for("student.dashboard"))
 
 
+@student.route("/waitlist/<int:course_id>/leave", methods=["POST"])
+@login_required
+@student_required
+def leave_waitlist(course_id):
+    """Leave a full course's waitlist."""
+
+    try:
+        removed = leave_course_waitlist(current_user.user_id, course_id)
+        db.session.commit()
+        flash("You left the waitlist." if removed else "You are not on this course's waitlist.")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error leaving waitlist: {str(e)}")
+
+    return redirect(url_for("student.dashboard"))
+
+
+@student.route("/progress", methods=["POST"])
+@login_required
+@student_required
+def track_progress():
+    """Accept content progress events; they are written in batches (see progress.py)."""
+
+    try:
+        events = parse_events(current_user.user_id, request.get_json(silent=True))
+    except ProgressEventError as e:
+        return jsonify({"error": str(e)}), 400
+
+    record_progress(events)
+    return jsonify({"accepted": len(events)}), 202
+
+
+@student.route("/calendar/<token>.ics")
+@conditional(lambda token: [
+    deadlines_stamp(student_for_token(token)),
+    (date.today(), None),
+])
+def deadlines_feed(token):
+    """iCalendar feed of the student's deadlines; the signed token stands in for a login."""
+
+    student_id = student_for_token(token)
+    if student_id is None:
+        abort(404)
+
+    since = date.today() - timedelta(days=FEED_PAST_DAYS)
+    deadlines = cached_deadlines(student_id, since=since, limit=FEED_LIMIT)
+    return Response(to_ical(deadlines), mimetype="text/calendar")
+
+
+@student.route("/calendar/reset", methods=["POST"])
+@login_required
+@student_required
+def reset_deadlines_feed():
+    """Issue a new calendar link and revoke the old one."""
+
+    reset_feed_secret(db.session.get(Student, current_user.user_id))
+    db.session.commit()
+    flash("Your calendar link was reset. Subscribe again with the new link.")
+    return redirect(url_for("student.dashboard"))
+
+
 @student.route("/course/<int:course_id>")
 @login_required
 @student_required
+@conditional(lambda course_id: [
+    data_version_stamp(CATALOG),
+    course_stamp(course_id),
+    enrollments_stamp(student_id=current_user.user_id, course_id=course_id),
+    progress_stamp(current_user.user_id, course_id),
+    submissions_stamp(),
+])
 def course_detail(course_id):
     """View details of an enrolled course."""
 
@@ -216,8 +420,8 @@ def course_detail(course_id):
     books = course.online_books
     instructors = course.instructors
 
-    # Get topics and textbooks
-    modules = course.modules
+    # Get textbooks (the module outline is loaded by the template, and only
+    # when its cached fragment is missing)
     textbooks = course.online_books
     
     submissions = []
@@ -226,6 +430,7 @@ def course_detail(course_id):
             submissions = json.load(f)
     
     student_submissions = [s for s in submissions if s['student_id'] == current_user.user_id]
+    submission_state = _submission_state(course_id, student_submissions)
 
 
     return render_template(
@@ -237,11 +442,34 @@ def course_detail(course_id):
         notes=notes,
         books=books,
         instructors=instructors,
-        modules=modules,
         textbooks=textbooks,
         student_submissions=student_submissions,
+        submission_state=submission_state,
+        progress=course_progress(current_user.user_id, [course_id])[course_id],
+        content_progress=content_states(current_user.user_id, course_id),
     )
 
+def _submission_state(course_id, student_submissions):
+    """(assignment_id, grade) of the student's submissions in this course.
+
+    Part of the outline fragment's cache key: students without submissions
+    in the course all share one rendered outline.
+    """
+    if not student_submissions:
+        return ()
+    assignment_ids = {
+        aid for (aid,) in db.session.query(SubtopicAssignment.assignment_id)
+        .join(TopicSubtopic, TopicSubtopic.subtopic_id == SubtopicAssignment.subtopic_id)
+        .join(ModuleTopic, ModuleTopic.topic_id == TopicSubtopic.topic_id)
+        .join(CourseModule, CourseModule.module_id == ModuleTopic.module_id)
+        .filter(CourseModule.course_id == course_id)
+    }
+    return tuple(sorted(
+        (s['assignment_id'], s['grade'])
+        for s in student_submissions
+        if s['assignment_id'] in assignment_ids
+    ))
+
 @student.route('/course/<int:course_id>/submit/<int:assignment_id>', methods=['POST'])
 @login_required
 @student_required
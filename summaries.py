@@ -0,0 +1,172 @@
+"""
+Per-student enrollment summaries.
+
+`student_summaries` holds one row per student with enrollments: enrolled
+and graded course counts, the marks sum and GPA, total course weeks and the
+next upcoming (today or later) due date of an ungraded course. The student dashboard and grades pages
+read that row instead of aggregating every enrollment on each request, and
+use its enrolled_count as the total for their paginated course lists.
+
+Rows are rebuilt in the writing transaction: a before_flush hook notes the
+students whose enrollments (or enrolled courses' durations) change, and an
+after_flush hook re-aggregates just those students from `enrollments` -
+so enroll, unenroll, grading, admin edits and deregistration approvals all
+keep it current without any route doing bookkeeping. Re-aggregating rather
+than applying deltas means a summary can't drift.
+
+The rollup is written with INSERT ... SELECT ... ON CONFLICT DO UPDATE,
+so two transactions refreshing the same student (two tabs, a cart racing
+a single enroll, a waitlist promotion) both succeed instead of one hitting
+the primary key. Only students left without enrollments lose their row.
+
+next_due_date also goes stale with the calendar: once the day passes, the
+stored date is in the past although no enrollment changed. Run
+`flask refresh-summaries` daily to rebuild those rows; student_summary
+rebuilds a stale row on read too, so a missed run never shows a past date.
+"""
+
+from datetime import date
+
+from sqlalchemy import and_, case, delete, event, exists, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .models import db, Course, Enrollment, StudentSummary
+
+
+COURSES_PER_PAGE = 12
+
+_PENDING = "student_summary_ids"
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_summaries = StudentSummary.__table__
+
+_COLUMNS = [
+    "student_id", "enrolled_count", "graded_count", "marks_sum", "gpa",
+    "total_weeks", "next_due_date", "updated_at",
+]
+
+
+def _dialect(conn):
+    return conn.dialect if hasattr(conn, "dialect") else conn.get_bind().dialect
+
+
+def refresh_student_summaries(conn, student_ids=None):
+    """Rebuild the summaries of `student_ids` (all students when None)."""
+    if student_ids is not None and not student_ids:
+        return
+
+    graded = func.count(Enrollment.marks)
+    aggregate = (
+        select(
+            Enrollment.student_id,
+            func.count(),
+            graded,
+            func.coalesce(func.sum(Enrollment.marks), 0),
+            case((graded > 0, func.round(func.sum(Enrollment.marks) / graded, 2)), else_=None),
+            func.coalesce(func.sum(Course.duration_weeks), 0),
+            func.min(case(
+                (and_(Enrollment.marks.is_(None), Enrollment.due_by >= func.current_date()), Enrollment.due_by),
+                else_=None,
+            )),
+            func.current_timestamp(),
+        )
+        .join(Course, Course.course_id == Enrollment.course_id)
+        .group_by(Enrollment.student_id)
+    )
+    enrolled = exists().where(Enrollment.student_id == _summaries.c.student_id)
+    clear = delete(_summaries).where(~enrolled)
+    if student_ids is not None:
+        aggregate = aggregate.where(Enrollment.student_id.in_(student_ids))
+        clear = clear.where(_summaries.c.student_id.in_(student_ids))
+    else:
+        # SQLite needs a WHERE to parse INSERT ... SELECT ... ON CONFLICT.
+        aggregate = aggregate.where(Enrollment.student_id.isnot(None))
+
+    upsert = _INSERTS[_dialect(conn).name](_summaries).from_select(_COLUMNS, aggregate)
+    conn.execute(upsert.on_conflict_do_update(
+        index_elements=["student_id"],
+        set_={name: upsert.excluded[name] for name in _COLUMNS[1:]},
+    ))
+    conn.execute(clear)
+
+
+def refresh_stale_summaries(conn):
+    """Rebuild the summaries whose next_due_date has passed; returns how many."""
+    stale = list(conn.scalars(
+        select(StudentSummary.student_id).where(StudentSummary.next_due_date < func.current_date())
+    ))
+    refresh_student_summaries(conn, stale)
+    return len(stale)
+
+
+def student_summary(student_id):
+    """The student's summary row (an all-zero one if they have no enrollments)."""
+    summary = db.session.get(StudentSummary, student_id)
+    if summary is not None and summary.next_due_date and summary.next_due_date < date.today():
+        refresh_student_summaries(db.session, [student_id])
+        db.session.commit()
+        summary = db.session.get(StudentSummary, student_id)
+    return summary or StudentSummary(
+        student_id=student_id,
+        enrolled_count=0,
+        graded_count=0,
+        marks_sum=0,
+        gpa=None,
+        total_weeks=0,
+        next_due_date=None,
+    )
+
+
+# --- maintenance hooks ---
+
+def _note_changed_students(session, flush_context, instances):
+    pending = session.info.setdefault(_PENDING, set())
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Enrollment):
+            pending.add(obj.student_id)
+    for obj in session.dirty:
+        if isinstance(obj, Enrollment) and session.is_modified(obj):
+            pending.add(obj.student_id)
+            # A moved enrollment also changes its old student's summary.
+            old_ids = db.inspect(obj).attrs.student_id.history.deleted
+            pending.update(old_ids)
+
+    # Course deletes cascade in the database; duration edits change total_weeks.
+    course_ids = [obj.course_id for obj in session.deleted if isinstance(obj, Course)]
+    course_ids += [
+        obj.course_id
+        for obj in session.dirty
+        if isinstance(obj, Course) and db.inspect(obj).attrs.duration_weeks.history.has_changes()
+    ]
+    if course_ids:
+        with session.no_autoflush:
+            pending.update(
+                session.scalars(
+                    select(Enrollment.student_id).where(Enrollment.course_id.in_(course_ids))
+                )
+            )
+    pending.discard(None)
+
+
+def _refresh_changed_students(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        refresh_student_summaries(session, sorted(pending))
+
+
+def _discard_pending(session, previous_transaction=None):
+    session.info.pop(_PENDING, None)
+
+
+_listeners_installed = False
+
+
+def init_summaries(app):
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(db.session, "before_flush", _note_changed_students)
+        event.listen(db.session, "after_flush", _refresh_changed_students)
+        event.listen(db.session, "after_soft_rollback", _discard_pending)
+        _listeners_installed = True